@@ -0,0 +1,131 @@
+"""
+Regroupement des analyses de sentiment concurrentes pour l'application Léo.
+Les requêtes qui arrivent dans une même fenêtre de quelques millisecondes sont
+soumises ensemble au modèle, en un seul passage par lots.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Dict, Any
+
+from src.ai_modules.sentiment_analyzer import SentimentAnalyzer, get_sentiment_analyzer
+
+# Taille maximale d'un lot et durée d'attente des requêtes suivantes
+MAX_BATCH = 16
+BATCH_WINDOW_MS = 10
+
+
+class SentimentBatcher:
+    def __init__(self, analyzer: SentimentAnalyzer, max_batch: int = MAX_BATCH, window_ms: int = BATCH_WINDOW_MS):
+        """
+        Initialise le regroupeur d'analyses.
+
+        Args:
+            analyzer (SentimentAnalyzer): Module de détection émotionnelle utilisé pour les lots
+            max_batch (int): Nombre maximal de messages par lot
+            window_ms (int): Attente maximale (ms) des messages suivants après le premier
+        """
+        self.analyzer = analyzer
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue = queue.Queue()
+
+        # Signalé par le thread de traitement une fois le modèle chargé
+        self._ready = threading.Event()
+
+        # Le thread de traitement n'est démarré qu'à la première soumission (après le fork des workers)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        """
+        Place un message dans la file d'analyse.
+
+        Args:
+            text (str): Le texte à analyser
+
+        Returns:
+            Future: Résultat à venir de l'analyse
+        """
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='sentiment-batcher', daemon=True)
+                    self._worker.start()
+
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def analyze(self, text: str, timeout: float = 30.0) -> Dict[str, Any]:
+        """
+        Analyse un message en le regroupant avec les requêtes concurrentes.
+        Le chargement initial du modèle n'est pas décompté du délai d'attente.
+
+        Args:
+            text (str): Le texte à analyser
+            timeout (float): Attente maximale du résultat une fois le modèle chargé, en secondes
+
+        Returns:
+            Dict[str, Any]: Résultat de l'analyse
+
+        Raises:
+            concurrent.futures.TimeoutError: Si le résultat n'est pas disponible à temps
+        """
+        future = self.submit(text)
+        self._ready.wait()
+        return future.result(timeout=timeout)
+
+    def _run(self):
+        """Boucle du thread de traitement : constitue les lots puis les soumet au modèle"""
+        # Le modèle est chargé avant de traiter le premier lot
+        try:
+            self.analyzer.sentiment_pipeline
+        finally:
+            self._ready.set()
+
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=self.window))
+            except queue.Empty:
+                pass
+
+            try:
+                results = self.analyzer.analyze_sentiments([text for text, _ in batch])
+            except Exception as e:
+                print(f"Erreur lors de l'analyse groupée: {e}")
+                # Reprise message par message, pour qu'un texte invalide ne fasse pas échouer les autres
+                for text, future in batch:
+                    self._analyze_one(text, future)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _analyze_one(self, text: str, future: Future):
+        """
+        Analyse un message seul et transmet le résultat (ou l'erreur) à sa requête.
+
+        Args:
+            text (str): Le texte à analyser
+            future (Future): Résultat à venir de la requête
+        """
+        try:
+            future.set_result(self.analyzer.analyze_sentiments([text])[0])
+        except Exception as e:
+            future.set_exception(e)
+
+
+@lru_cache(maxsize=1)
+def get_sentiment_batcher() -> SentimentBatcher:
+    """
+    Retourne le regroupeur partagé, adossé au module de détection émotionnelle partagé.
+
+    Returns:
+        SentimentBatcher: Instance partagée
+    """
+    return SentimentBatcher(get_sentiment_analyzer())
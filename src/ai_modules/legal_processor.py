@@ -5,23 +5,139 @@ les informations clés de manière structurée.
 """
 
 import re
+import io
+import copy
 import json
-from typing import Dict, List, Any, Optional
-from datetime import datetime
-import spacy
-from spacy.matcher import Matcher
+import time
+import hashlib
+import threading
+import dataclasses
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Set, Tuple, BinaryIO
+from datetime import datetime, timezone
+
+
+@dataclass(slots=True)
+class Parties:
+    """Noms des parties (père, mère)."""
+    pere: str = ''
+    mere: str = ''
+
+
+@dataclass(slots=True)
+class Vacances:
+    """Informations sur les vacances scolaires."""
+    alternance: bool = False
+    details: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Pension:
+    """Informations sur la pension alimentaire."""
+    montant: str = ''
+    periodicite: str = ''
+    details: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ExtractedData:
+    """
+    Informations extraites d'un document juridique.
+    Converties en dictionnaire (to_dict) uniquement au moment de renvoyer le résultat.
+    """
+    document_type: str = ''
+    parties: Parties = field(default_factory=Parties)
+    jours_garde: List[str] = field(default_factory=list)
+    horaires: List[str] = field(default_factory=list)
+    lieux_remise: List[str] = field(default_factory=list)
+    interdits: List[str] = field(default_factory=list)
+    obligations: List[str] = field(default_factory=list)
+    vacances_scolaires: Vacances = field(default_factory=Vacances)
+    pension_alimentaire: Pension = field(default_factory=Pension)
+    dates_importantes: List[str] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Sérialise les données extraites (format JSON de l'API).
+        
+        Returns:
+            Dict[str, Any]: Données extraites sous forme de dictionnaire
+        """
+        return asdict(self)
+
+
+# Noms des champs de ExtractedData, calculés une seule fois
+_EXTRACTED_FIELDS = tuple(f.name for f in dataclasses.fields(ExtractedData))
+
+
+# Horodatage ISO mis en cache à la seconde (seconde UNIX, chaîne ISO)
+_iso_cache = (0, '')
+
+
+def _iso_now() -> str:
+    """
+    Retourne l'horodatage UTC courant au format ISO, à la seconde près.
+    La chaîne n'est reconstruite qu'une fois par seconde.
+    
+    Returns:
+        str: Date et heure UTC au format ISO 8601
+    """
+    global _iso_cache
+    now = int(time.time())
+    cached_second, cached_iso = _iso_cache
+    if now != cached_second:
+        cached_iso = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None).isoformat()
+        _iso_cache = (now, cached_iso)
+    return cached_iso
+
+
+@lru_cache(maxsize=1)
+def _get_fr_nlp():
+    """
+    Charge une seule fois par processus le modèle spaCy français, partagé par
+    toutes les instances de LegalProcessor. Le parser et le NER, inutilisés,
+    ne sont pas chargés.
+    
+    Returns:
+        Le pipeline spaCy, ou None si le modèle n'est pas installé
+    """
+    try:
+        import spacy
+        return spacy.load("fr_core_news_sm", disable=["parser", "ner"])
+    except (ImportError, OSError):
+        print("Modèle spaCy français non trouvé. Installation requise: python -m spacy download fr_core_news_sm")
+        return None
+
 
 class LegalProcessor:
-    def __init__(self):
+    # Texte de jugement renvoyé par la simulation OCR (pour les tests)
+    _SIMULATED_OCR_TEXT = """
+        TRIBUNAL DE GRANDE INSTANCE
+        JUGEMENT
+        
+        Entre M. MARTIN Pierre et Mme DURAND Marie
+        
+        Il est ordonné que:
+        - La garde de l'enfant sera exercée en résidence alternée
+        - L'enfant sera remis tous les vendredis à 18h au domicile maternel
+        - Les vacances scolaires seront partagées par alternance
+        - Une pension alimentaire de 300€ par mois sera versée
+        - Il est interdit de dénigrer l'autre parent devant l'enfant
+        """
+    
+    def __init__(self, upload_cache_size: int = 256):
         """
         Initialise le module de traitement juridique.
+        
+        Args:
+            upload_cache_size (int): Nombre maximal de documents téléversés dont le résultat est conservé (LRU)
         """
-        try:
-            # Chargement du modèle spaCy français
-            self.nlp = spacy.load("fr_core_news_sm")
-        except OSError:
-            print("Modèle spaCy français non trouvé. Installation requise: python -m spacy download fr_core_news_sm")
-            self.nlp = None
+        # Résultats des documents téléversés, indexés par l'empreinte BLAKE2b de leur contenu
+        self.upload_cache_size = upload_cache_size
+        self._upload_cache = OrderedDict()
+        self._upload_cache_lock = threading.Lock()
         
         # Patterns pour l'extraction d'informations juridiques
         self.patterns = {
@@ -65,6 +181,74 @@ class LegalProcessor:
             'garde', 'résidence', 'droit de visite', 'hébergement',
             'pension alimentaire', 'contribution', 'autorité parentale'
         ]
+        
+        # Mots-clés littéraux recherchés en une seule passe sur le texte
+        self.jours_semaine = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+        self.lieux_patterns = [
+            'domicile maternel',
+            'domicile paternel',
+            'école de l\'enfant',
+            'lieu de résidence',
+            'domicile de la mère',
+            'domicile du père'
+        ]
+        # Groupes de mots-clés figés pour les tests d'appartenance / intersections
+        self._days = frozenset(self.jours_semaine)
+        self._weekend_keywords = frozenset(['week-end', 'weekend'])
+        self._alternance_keywords = frozenset(['une semaine sur deux', 'garde alternée'])
+        self.search_keywords = self.jours_semaine + self.lieux_patterns + [
+            *self._weekend_keywords, *self._alternance_keywords,
+            'ordonnance', 'référé', 'jugement', 'convention', 'homolog',
+            'vacances scolaires', 'alternance', 'une année sur deux',
+            'par mois', 'mensuel', 'par an', 'annuel'
+        ]
+        
+        # Table de traduction des caractères de contrôle (C0 et C1) vers une espace
+        self._ctrl_table = dict.fromkeys(list(range(0x00, 0x20)) + list(range(0x7f, 0xa0)), ord(' '))
+        
+        # Expressions régulières précompilées (évite la recompilation à chaque document)
+        self._re_ws = re.compile(r'\s+')
+        # En-têtes/pieds de page courants, supprimés en une seule passe
+        self._re_headers = re.compile(
+            r'page\s+\d+\s+sur\s+\d+|tribunal\s+de\s+grande\s+instance', re.IGNORECASE
+        )
+        self._re_sent_split = re.compile(r'[.!?]')
+        # Appliquées aux phrases déjà en minuscules
+        self._re_interdict = re.compile(r'interdit|défense|prohibition|ne peut pas')
+        self._re_obligation = re.compile(r'à charge pour|devra|est tenu de|obligation de')
+        # Horaires et dates relevés en un seul parcours, chaque alternative étant
+        # identifiée par son groupe nommé
+        self._re_structured = re.compile(
+            r'(?P<heure>(?-i:\b\d{1,2}(?:h\d{0,2}|:\d{2})\b))'
+            r'|(?P<heure_txt>à\s+(?P<heure_txt_h>\d{1,2})\s*heures?)'
+            r'|(?P<date_num>\b\d{1,2}[/-]\d{1,2}[/-]\d{4}\b)'
+            r'|(?P<date_fr>\b\d{1,2}\s+(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s+\d{4}\b)',
+            re.IGNORECASE
+        )
+        # Montants relevés à part : leurs chiffres peuvent chevaucher une date ou un horaire
+        # (« 12 mars 2021 euros »), ce que les alternatives d'un même parcours ne permettent pas
+        self._re_montant = re.compile(r'(\d+(?:,\d{2})?)\s*(?:€|euros?)', re.IGNORECASE)
+        # Quantificateurs possessifs et groupe atomique : pas de retour arrière
+        # sur les suites de mots capitalisés (texte OCR arbitraire)
+        self._re_party = re.compile(
+            r'\b(M\.|Mme|Monsieur|Madame)\s++'
+            r'([A-ZÉÈÀ][a-zéèàêâîôû]++(?>\s+[A-ZÉÈÀ][a-zéèàêâîôû]++)*+)'
+        )
+        self._party_roles = {'M.': 'pere', 'Monsieur': 'pere', 'Mme': 'mere', 'Madame': 'mere'}
+        # Lookahead pour relever aussi les mots-clés qui se chevauchent
+        keywords = sorted(self.search_keywords, key=len, reverse=True)
+        self._re_keywords = re.compile('(?=(' + '|'.join(re.escape(k) for k in keywords) + '))')
+    
+    @property
+    def nlp(self):
+        """
+        Modèle spaCy français, chargé paresseusement au premier accès
+        et partagé au niveau du processus (voir _get_fr_nlp).
+        
+        Returns:
+            Le pipeline spaCy, ou None si le modèle n'est pas installé
+        """
+        return _get_fr_nlp()
     
     def process_document(self, text: str) -> Dict[str, Any]:
         """
@@ -86,29 +270,44 @@ class LegalProcessor:
         try:
             # Nettoyage du texte
             cleaned_text = self._clean_text(text)
+            # Version minuscule calculée une seule fois pour tout le document
+            cleaned_lower = cleaned_text.lower()
+            
+            # Recherche de tous les mots-clés en une seule passe
+            keywords_found = self._find_keywords(cleaned_lower)
+            
+            # Horaires et dates en une seule passe, puis montants
+            fields = self._scan_structured_fields(cleaned_text)
+            
+            # Découpage en phrases une seule fois pour tous les extracteurs
+            # (les séparateurs sont inchangés par lower(), les deux découpages coïncident)
+            sentences = list(zip(
+                self._re_sent_split.split(cleaned_text),
+                self._re_sent_split.split(cleaned_lower)
+            ))
             
             # Extraction des informations
-            extracted_data = {
-                'document_type': self._identify_document_type(cleaned_text),
-                'parties': self._extract_parties(cleaned_text),
-                'jours_garde': self._extract_garde_days(cleaned_text),
-                'horaires': self._extract_horaires(cleaned_text),
-                'lieux_remise': self._extract_lieux(cleaned_text),
-                'interdits': self._extract_interdictions(cleaned_text),
-                'obligations': self._extract_obligations(cleaned_text),
-                'vacances_scolaires': self._extract_vacances(cleaned_text),
-                'pension_alimentaire': self._extract_pension(cleaned_text),
-                'dates_importantes': self._extract_dates(cleaned_text)
-            }
+            extracted_data = ExtractedData(
+                document_type=self._identify_document_type(keywords_found),
+                parties=self._extract_parties(cleaned_text),
+                jours_garde=self._extract_garde_days(keywords_found),
+                horaires=self._extract_horaires(fields),
+                lieux_remise=self._extract_lieux(keywords_found),
+                interdits=self._extract_interdictions(sentences),
+                obligations=self._extract_obligations(sentences),
+                vacances_scolaires=self._extract_vacances(sentences, keywords_found),
+                pension_alimentaire=self._extract_pension(fields, keywords_found),
+                dates_importantes=self._extract_dates(fields)
+            )
             
-            # Validation et nettoyage des données extraites
-            extracted_data = self._validate_extracted_data(extracted_data)
+            # Validation des données extraites et calcul de la confiance
+            extracted_data, confidence = self._finalize(extracted_data)
             
             return {
                 'success': True,
-                'extracted_data': extracted_data,
-                'processing_date': datetime.utcnow().isoformat(),
-                'confidence_score': self._calculate_confidence(extracted_data)
+                'extracted_data': extracted_data.to_dict(),
+                'processing_date': _iso_now(),
+                'confidence_score': confidence
             }
             
         except Exception as e:
@@ -129,41 +328,75 @@ class LegalProcessor:
             str: Texte nettoyé
         """
         # Suppression des caractères de contrôle et normalisation
-        cleaned = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', text)
+        cleaned = text.translate(self._ctrl_table)
         
         # Normalisation des espaces
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = self._re_ws.sub(' ', cleaned)
         
         # Suppression des en-têtes/pieds de page courants
-        cleaned = re.sub(r'page\s+\d+\s+sur\s+\d+', '', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'tribunal\s+de\s+grande\s+instance', '', cleaned, flags=re.IGNORECASE)
+        cleaned = self._re_headers.sub('', cleaned)
         
         return cleaned.strip()
     
-    def _identify_document_type(self, text: str) -> str:
+    def _find_keywords(self, text_lower: str) -> Set[str]:
         """
-        Identifie le type de document juridique.
+        Relève en une seule passe les mots-clés présents dans le texte.
+        
+        Args:
+            text_lower (str): Texte du document en minuscules
+            
+        Returns:
+            Set[str]: Mots-clés trouvés
+        """
+        return {match.group(1) for match in self._re_keywords.finditer(text_lower)}
+    
+    def _scan_structured_fields(self, text: str) -> Dict[str, List[str]]:
+        """
+        Relève les horaires et dates du texte en une seule passe, puis les montants.
         
         Args:
             text (str): Texte du document
             
         Returns:
-            str: Type de document identifié
+            Dict[str, List[str]]: Valeurs trouvées par champ ('horaires', 'dates', 'montants')
         """
-        text_lower = text.lower()
+        fields = {'horaires': [], 'dates': [], 'montants': []}
         
-        if 'ordonnance' in text_lower and 'référé' in text_lower:
+        for match in self._re_structured.finditer(text):
+            kind = match.lastgroup
+            if kind == 'heure':
+                fields['horaires'].append(match.group(0))
+            elif kind == 'heure_txt':
+                fields['horaires'].append(f"{match.group('heure_txt_h')}h")
+            else:
+                fields['dates'].append(match.group(0))
+        
+        fields['montants'] = self._re_montant.findall(text)
+        
+        return fields
+    
+    def _identify_document_type(self, keywords_found: Set[str]) -> str:
+        """
+        Identifie le type de document juridique.
+        
+        Args:
+            keywords_found (Set[str]): Mots-clés présents dans le document
+            
+        Returns:
+            str: Type de document identifié
+        """
+        if 'ordonnance' in keywords_found and 'référé' in keywords_found:
             return 'ordonnance_refere'
-        elif 'jugement' in text_lower:
+        elif 'jugement' in keywords_found:
             return 'jugement'
-        elif 'ordonnance' in text_lower:
+        elif 'ordonnance' in keywords_found:
             return 'ordonnance'
-        elif 'convention' in text_lower and 'homolog' in text_lower:
+        elif 'convention' in keywords_found and 'homolog' in keywords_found:
             return 'convention_homologuee'
         else:
             return 'document_juridique'
     
-    def _extract_parties(self, text: str) -> Dict[str, str]:
+    def _extract_parties(self, text: str) -> Parties:
         """
         Extrait les noms des parties (père, mère).
         
@@ -171,115 +404,79 @@ class LegalProcessor:
             text (str): Texte du document
             
         Returns:
-            Dict[str, str]: Noms des parties
+            Parties: Noms des parties
         """
-        parties = {'pere': '', 'mere': ''}
-        
-        # Patterns pour identifier les parties
-        patterns = [
-            r'M\.\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            r'Mme\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            r'Monsieur\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            r'Madame\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)'
-        ]
+        parties = Parties()
         
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                # Logique simple: premier nom = père, deuxième = mère
-                if not parties['pere'] and matches:
-                    parties['pere'] = matches[0]
-                elif not parties['mere'] and len(matches) > 1:
-                    parties['mere'] = matches[1]
+        # La civilité détermine la partie, le premier nom trouvé l'emporte
+        for match in self._re_party.finditer(text):
+            role = self._party_roles[match.group(1)]
+            if not getattr(parties, role):
+                setattr(parties, role, match.group(2))
+                if parties.pere and parties.mere:
+                    break
         
         return parties
     
-    def _extract_garde_days(self, text: str) -> List[str]:
+    def _extract_garde_days(self, keywords_found: Set[str]) -> List[str]:
         """
         Extrait les jours de garde.
         
         Args:
-            text (str): Texte du document
+            keywords_found (Set[str]): Mots-clés présents dans le document
             
         Returns:
             List[str]: Liste des jours de garde
         """
-        jours = []
-        text_lower = text.lower()
-        
-        # Jours de la semaine
-        jours_semaine = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
-        for jour in jours_semaine:
-            if jour in text_lower:
-                jours.append(jour)
+        # Jours de la semaine (ensemble : pas de doublons à supprimer ensuite)
+        jours = self._days & keywords_found
         
         # Patterns spéciaux
-        if 'week-end' in text_lower or 'weekend' in text_lower:
-            jours.extend(['samedi', 'dimanche'])
+        if not self._weekend_keywords.isdisjoint(keywords_found):
+            jours |= {'samedi', 'dimanche'}
         
-        if 'une semaine sur deux' in text_lower or 'garde alternée' in text_lower:
-            jours.append('garde_alternee')
+        if not self._alternance_keywords.isdisjoint(keywords_found):
+            jours |= {'garde_alternee'}
         
-        return list(set(jours))  # Suppression des doublons
+        return list(jours)
     
-    def _extract_horaires(self, text: str) -> List[str]:
+    def _extract_horaires(self, fields: Dict[str, List[str]]) -> List[str]:
         """
-        Extrait les horaires mentionnés.
+        Extrait les horaires mentionnés (18h, 18h30, 18:30, "à 18 heures").
         
         Args:
-            text (str): Texte du document
+            fields (Dict[str, List[str]]): Champs structurés relevés dans le document
             
         Returns:
             List[str]: Liste des horaires
         """
-        horaires = []
-        
-        # Pattern pour les heures (18h, 18h30, 18:30)
-        pattern_heures = r'\b\d{1,2}(?:h\d{0,2}|:\d{2})\b'
-        matches = re.findall(pattern_heures, text)
-        horaires.extend(matches)
-        
-        # Pattern pour "à X heures"
-        pattern_heures_text = r'à\s+(\d{1,2})\s*heures?'
-        matches = re.findall(pattern_heures_text, text, re.IGNORECASE)
-        horaires.extend([f"{h}h" for h in matches])
-        
-        return list(set(horaires))
+        # Suppression des doublons en conservant l'ordre d'apparition
+        return list(dict.fromkeys(fields['horaires']))
     
-    def _extract_lieux(self, text: str) -> List[str]:
+    def _extract_lieux(self, keywords_found: Set[str]) -> List[str]:
         """
         Extrait les lieux de remise/récupération.
         
         Args:
-            text (str): Texte du document
+            keywords_found (Set[str]): Mots-clés présents dans le document
             
         Returns:
             List[str]: Liste des lieux
         """
         lieux = []
-        text_lower = text.lower()
         
-        lieux_patterns = [
-            'domicile maternel',
-            'domicile paternel',
-            'école de l\'enfant',
-            'lieu de résidence',
-            'domicile de la mère',
-            'domicile du père'
-        ]
-        
-        for lieu in lieux_patterns:
-            if lieu in text_lower:
+        for lieu in self.lieux_patterns:
+            if lieu in keywords_found:
                 lieux.append(lieu)
         
         return lieux
     
-    def _extract_interdictions(self, text: str) -> List[str]:
+    def _extract_interdictions(self, sentences: List[Tuple[str, str]]) -> List[str]:
         """
         Extrait les interdictions mentionnées.
         
         Args:
-            text (str): Texte du document
+            sentences (List[Tuple[str, str]]): Phrases du document et leur version en minuscules
             
         Returns:
             List[str]: Liste des interdictions
@@ -287,20 +484,18 @@ class LegalProcessor:
         interdictions = []
         
         # Recherche de phrases contenant des interdictions
-        sentences = re.split(r'[.!?]', text)
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            if any(word in sentence_lower for word in ['interdit', 'défense', 'prohibition', 'ne peut pas']):
+        for sentence, sentence_lower in sentences:
+            if self._re_interdict.search(sentence_lower):
                 interdictions.append(sentence.strip())
         
         return interdictions[:5]  # Limitation à 5 interdictions max
     
-    def _extract_obligations(self, text: str) -> List[str]:
+    def _extract_obligations(self, sentences: List[Tuple[str, str]]) -> List[str]:
         """
         Extrait les obligations mentionnées.
         
         Args:
-            text (str): Texte du document
+            sentences (List[Tuple[str, str]]): Phrases du document et leur version en minuscules
             
         Returns:
             List[str]: Liste des obligations
@@ -308,139 +503,138 @@ class LegalProcessor:
         obligations = []
         
         # Recherche de phrases contenant des obligations
-        sentences = re.split(r'[.!?]', text)
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            if any(phrase in sentence_lower for phrase in ['à charge pour', 'devra', 'est tenu de', 'obligation de']):
+        for sentence, sentence_lower in sentences:
+            if self._re_obligation.search(sentence_lower):
                 obligations.append(sentence.strip())
         
         return obligations[:5]  # Limitation à 5 obligations max
     
-    def _extract_vacances(self, text: str) -> Dict[str, Any]:
+    def _extract_vacances(self, sentences: List[Tuple[str, str]], keywords_found: Set[str]) -> Vacances:
         """
         Extrait les informations sur les vacances scolaires.
         
         Args:
-            text (str): Texte du document
+            sentences (List[Tuple[str, str]]): Phrases du document et leur version en minuscules
+            keywords_found (Set[str]): Mots-clés présents dans le document
             
         Returns:
-            Dict[str, Any]: Informations sur les vacances
+            Vacances: Informations sur les vacances
         """
-        vacances = {
-            'alternance': False,
-            'details': []
-        }
+        vacances = Vacances()
         
-        text_lower = text.lower()
-        
-        if 'vacances scolaires' in text_lower:
-            if 'alternance' in text_lower or 'une année sur deux' in text_lower:
-                vacances['alternance'] = True
+        if 'vacances scolaires' in keywords_found:
+            if 'alternance' in keywords_found or 'une année sur deux' in keywords_found:
+                vacances.alternance = True
             
             # Extraction des détails sur les vacances
-            sentences = re.split(r'[.!?]', text)
-            for sentence in sentences:
-                if 'vacances' in sentence.lower():
-                    vacances['details'].append(sentence.strip())
+            for sentence, sentence_lower in sentences:
+                if 'vacances' in sentence_lower:
+                    vacances.details.append(sentence.strip())
         
         return vacances
     
-    def _extract_pension(self, text: str) -> Dict[str, Any]:
+    def _extract_pension(self, fields: Dict[str, List[str]], keywords_found: Set[str]) -> Pension:
         """
         Extrait les informations sur la pension alimentaire.
         
         Args:
-            text (str): Texte du document
+            fields (Dict[str, List[str]]): Champs structurés relevés dans le document
+            keywords_found (Set[str]): Mots-clés présents dans le document
             
         Returns:
-            Dict[str, Any]: Informations sur la pension
+            Pension: Informations sur la pension
         """
-        pension = {
-            'montant': '',
-            'periodicite': '',
-            'details': []
-        }
+        pension = Pension()
         
-        # Pattern pour les montants (123€, 123 euros)
-        montant_pattern = r'(\d+(?:,\d{2})?)\s*(?:€|euros?)'
-        matches = re.findall(montant_pattern, text, re.IGNORECASE)
-        if matches:
-            pension['montant'] = matches[0] + '€'
+        # Premier montant trouvé (123€, 123 euros)
+        if fields['montants']:
+            pension.montant = fields['montants'][0] + '€'
         
         # Recherche de la périodicité
-        text_lower = text.lower()
-        if 'par mois' in text_lower or 'mensuel' in text_lower:
-            pension['periodicite'] = 'mensuelle'
-        elif 'par an' in text_lower or 'annuel' in text_lower:
-            pension['periodicite'] = 'annuelle'
+        if 'par mois' in keywords_found or 'mensuel' in keywords_found:
+            pension.periodicite = 'mensuelle'
+        elif 'par an' in keywords_found or 'annuel' in keywords_found:
+            pension.periodicite = 'annuelle'
         
         return pension
     
-    def _extract_dates(self, text: str) -> List[str]:
+    def _extract_dates(self, fields: Dict[str, List[str]]) -> List[str]:
         """
-        Extrait les dates importantes du document.
+        Extrait les dates importantes du document (DD/MM/YYYY, DD-MM-YYYY, "12 mars 2021").
         
         Args:
-            text (str): Texte du document
+            fields (Dict[str, List[str]]): Champs structurés relevés dans le document
             
         Returns:
             List[str]: Liste des dates
         """
-        dates = []
-        
-        # Pattern pour les dates (DD/MM/YYYY, DD-MM-YYYY)
-        date_patterns = [
-            r'\b\d{1,2}[/-]\d{1,2}[/-]\d{4}\b',
-            r'\b\d{1,2}\s+(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\s+\d{4}\b'
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            dates.extend(matches)
-        
-        return list(set(dates))
+        # Suppression des doublons en conservant l'ordre d'apparition
+        return list(dict.fromkeys(fields['dates']))
     
-    def _validate_extracted_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _finalize(self, data: ExtractedData) -> Tuple[ExtractedData, float]:
         """
-        Valide et nettoie les données extraites.
+        Valide et nettoie les données extraites, et calcule en même temps
+        un score de confiance basé sur la quantité d'informations extraites.
         
         Args:
-            data (Dict[str, Any]): Données extraites
+            data (ExtractedData): Données extraites
             
         Returns:
-            Dict[str, Any]: Données validées
+            Tuple[ExtractedData, float]: Données validées et score de confiance entre 0 et 1
         """
-        # Suppression des valeurs vides
-        for key, value in data.items():
+        total_fields = len(_EXTRACTED_FIELDS)
+        filled_fields = 0
+        
+        for name in _EXTRACTED_FIELDS:
+            value = getattr(data, name)
             if isinstance(value, list):
-                data[key] = [item for item in value if item and item.strip()]
+                # Suppression des valeurs vides, sur place
+                value[:] = [item for item in value if item and item.strip()]
+                if value:
+                    filled_fields += 1
             elif isinstance(value, str):
-                data[key] = value.strip() if value else ''
+                value = value.strip()
+                setattr(data, name, value)
+                if value:
+                    filled_fields += 1
+            elif any(getattr(value, slot) for slot in value.__slots__):
+                filled_fields += 1
         
-        return data
+        confidence = filled_fields / total_fields if total_fields > 0 else 0.0
+        return data, confidence
     
-    def _calculate_confidence(self, data: Dict[str, Any]) -> float:
+    def process_upload(self, fileobj: BinaryIO) -> Dict[str, Any]:
         """
-        Calcule un score de confiance basé sur la quantité d'informations extraites.
+        OCR puis traitement d'un document téléversé, mis en cache par empreinte du contenu :
+        un document déjà téléversé n'est ni relu ni retraité.
         
         Args:
-            data (Dict[str, Any]): Données extraites
+            fileobj (BinaryIO): Flux binaire du document
             
         Returns:
-            float: Score de confiance entre 0 et 1
-        """
-        total_fields = len(data)
-        filled_fields = 0
-        
-        for value in data.values():
-            if isinstance(value, list) and value:
-                filled_fields += 1
-            elif isinstance(value, dict) and any(value.values()):
-                filled_fields += 1
-            elif isinstance(value, str) and value.strip():
-                filled_fields += 1
-        
-        return filled_fields / total_fields if total_fields > 0 else 0.0
+            Dict[str, Any]: Informations extraites (copie, modifiable par l'appelant)
+        """
+        content = fileobj.read()
+        digest = hashlib.blake2b(content, digest_size=32).hexdigest()
+        
+        with self._upload_cache_lock:
+            result = self._upload_cache.get(digest)
+            if result is not None:
+                self._upload_cache.move_to_end(digest)
+        
+        if result is None:
+            result = self.process_document(self.simulate_ocr_stream(io.BytesIO(content)))
+            # Les échecs ne sont pas conservés
+            if result['success']:
+                with self._upload_cache_lock:
+                    self._upload_cache[digest] = result
+                    while len(self._upload_cache) > self.upload_cache_size:
+                        self._upload_cache.popitem(last=False)
+        
+        result = copy.deepcopy(result)
+        # Date du traitement courant, et non de la première lecture mise en cache
+        result['processing_date'] = _iso_now()
+        return result
     
     def simulate_ocr(self, file_path: str) -> str:
         """
@@ -453,18 +647,29 @@ class LegalProcessor:
         Returns:
             str: Texte extrait simulé
         """
-        # Simulation d'un texte de jugement pour les tests
-        return """
-        TRIBUNAL DE GRANDE INSTANCE
-        JUGEMENT
-        
-        Entre M. MARTIN Pierre et Mme DURAND Marie
+        return self._SIMULATED_OCR_TEXT
+    
+    def simulate_ocr_stream(self, fileobj: BinaryIO) -> str:
+        """
+        Simule un traitement OCR directement sur le flux téléversé, sans passer par un fichier temporaire.
+        Dans un environnement de production, le flux serait transmis à AWS Textract ou Tesseract.
         
-        Il est ordonné que:
-        - La garde de l'enfant sera exercée en résidence alternée
-        - L'enfant sera remis tous les vendredis à 18h au domicile maternel
-        - Les vacances scolaires seront partagées par alternance
-        - Une pension alimentaire de 300€ par mois sera versée
-        - Il est interdit de dénigrer l'autre parent devant l'enfant
+        Args:
+            fileobj (BinaryIO): Flux binaire du document
+            
+        Returns:
+            str: Texte extrait simulé
         """
+        return self._SIMULATED_OCR_TEXT
 
+
+@lru_cache(maxsize=1)
+def get_legal_processor() -> LegalProcessor:
+    """
+    Retourne l'instance partagée du module de traitement juridique.
+    L'instance est propre au processus (un exemplaire par worker Gunicorn).
+    
+    Returns:
+        LegalProcessor: Instance partagée
+    """
+    return LegalProcessor()
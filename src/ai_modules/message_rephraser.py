@@ -4,18 +4,39 @@ Transforme les messages conflictuels en communications neutres et apaisées,
 tout en préservant le contenu informatif.
 """
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
+import httpx
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
-from src.ai_modules.sentiment_analyzer import SentimentAnalyzer
+from src.ai_modules.sentiment_analyzer import get_sentiment_analyzer
+
+# Paramètres réseau explicites pour les appels OpenAI
+OPENAI_TIMEOUT = httpx.Timeout(20.0, connect=5.0)
+OPENAI_MAX_RETRIES = 2
+
+
+@lru_cache(maxsize=1)
+def _get_openai_client() -> OpenAI:
+    """
+    Client OpenAI partagé par le processus, créé au premier appel au LLM.
+    Son pool de connexions HTTP (keep-alive, TLS) est réutilisé d'une requête à l'autre.
+    
+    Returns:
+        OpenAI: Client partagé (utilise la variable d'environnement OPENAI_API_KEY)
+    """
+    return OpenAI(max_retries=OPENAI_MAX_RETRIES, timeout=OPENAI_TIMEOUT)
+
 
 class MessageRephraser:
     def __init__(self):
         """
         Initialise le module de reformulation intelligente.
         """
-        self.sentiment_analyzer = SentimentAnalyzer()
-        self.client = OpenAI()  # Utilise la variable d'environnement OPENAI_API_KEY
+        self.sentiment_analyzer = get_sentiment_analyzer()
         
         # Règles d'apaisement lexical
         self.trigger_replacements = {
@@ -38,6 +59,30 @@ class MessageRephraser:
             "pour éviter un malentendu",
             "afin de maintenir la stabilité pour l'enfant"
         ]
+        
+        # Expressions régulières précompilées
+        # Alternance unique des déclencheurs, les plus longs d'abord
+        triggers = sorted(self.trigger_replacements.keys(), key=len, reverse=True)
+        self._trigger_re = re.compile('|'.join(re.escape(t) for t in triggers), re.IGNORECASE)
+        self._trigger_lookup = {t.lower(): r for t, r in self.trigger_replacements.items()}
+        # Suites de '!' (remplacées par '.') et de '?' répétés (réduits à un seul)
+        self._re_punct = re.compile(r'!+|\?{2,}')
+        self._re_ws = re.compile(r'\s+')
+        # Éléments numérotés "1. ..." (y compris sur plusieurs lignes) dans une complétion
+        self._re_numbered = re.compile(r'^\s*(\d+)\.\s*(.+?)(?=\n\s*\d+\.|\Z)', re.MULTILINE | re.DOTALL)
+        
+        # Cache LRU en mémoire des réponses du LLM (évite un aller-retour réseau
+        # pour les messages répétés)
+        self.llm_cache_size = 1024
+        self._llm_cache = OrderedDict()
+        self._llm_cache_lock = threading.Lock()
+    
+    @property
+    def client(self) -> OpenAI:
+        """
+        Client OpenAI partagé, construit seulement au premier appel au LLM.
+        """
+        return _get_openai_client()
     
     def rephrase_message(self, original_message: str, context: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -67,6 +112,51 @@ class MessageRephraser:
         # Génération avec LLM (OpenAI)
         llm_versions = self._generate_with_llm(original_message, sentiment_analysis, context)
         
+        return self._build_result(original_message, sentiment_analysis, rule_based_version, llm_versions)
+    
+    async def rephrase_batch(self, messages: List[str], context: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """
+        Reformule plusieurs messages en parallélisant les appels au LLM.
+        
+        Args:
+            messages (List[str]): Les messages à reformuler
+            context (Optional[Dict]): Contexte additionnel commun aux messages
+            
+        Returns:
+            List[Dict[str, Any]]: Résultats de reformulation, dans l'ordre des messages
+        """
+        async def rephrase_one(original_message: str) -> Dict[str, Any]:
+            if not original_message or not original_message.strip():
+                return {
+                    'original': original_message,
+                    'rephrased_options': [],
+                    'analysis': {},
+                    'recommendation': 'Message vide'
+                }
+            
+            sentiment_analysis = self.sentiment_analyzer.analyze_sentiment(original_message)
+            rule_based_version = self._apply_typed_rules(original_message)
+            llm_versions = await self._generate_with_llm_async(async_client, original_message, sentiment_analysis, context)
+            
+            return self._build_result(original_message, sentiment_analysis, rule_based_version, llm_versions)
+        
+        # Un client asynchrone par lot : son pool de connexions est lié à la boucle d'événements
+        async with AsyncOpenAI(max_retries=OPENAI_MAX_RETRIES, timeout=OPENAI_TIMEOUT) as async_client:
+            return list(await asyncio.gather(*(rephrase_one(message) for message in messages)))
+    
+    def _build_result(self, original_message: str, sentiment_analysis: Dict, rule_based_version: str, llm_versions: List[str]) -> Dict[str, Any]:
+        """
+        Assemble le résultat final d'une reformulation.
+        
+        Args:
+            original_message (str): Le message original
+            sentiment_analysis (Dict): Analyse du sentiment
+            rule_based_version (str): Version basée sur les règles
+            llm_versions (List[str]): Versions générées par LLM
+            
+        Returns:
+            Dict[str, Any]: Résultat de la reformulation avec plusieurs options
+        """
         # Combinaison et validation des versions
         final_options = self._combine_and_validate(rule_based_version, llm_versions, sentiment_analysis)
         
@@ -90,83 +180,198 @@ class MessageRephraser:
         processed_message = message
         
         # Règles d'apaisement lexical
-        for trigger, replacement in self.trigger_replacements.items():
-            processed_message = re.sub(
-                re.escape(trigger), 
-                replacement, 
-                processed_message, 
-                flags=re.IGNORECASE
-            )
-        
-        # Suppression des points d'exclamation excessifs
-        processed_message = re.sub(r'!{2,}', '!', processed_message)
-        processed_message = re.sub(r'!', '.', processed_message)
+        processed_message = self._trigger_re.sub(
+            lambda m: self._trigger_lookup.get(m.group(0).lower(), m.group(0)),
+            processed_message
+        )
         
-        # Suppression des questions rhétoriques agressives
-        processed_message = re.sub(r'\?{2,}', '?', processed_message)
+        # Suppression des points d'exclamation et des questions rhétoriques agressives
+        processed_message = self._re_punct.sub(
+            lambda m: '.' if m.group(0)[0] == '!' else '?',
+            processed_message
+        )
         
         # Nettoyage des espaces multiples
-        processed_message = re.sub(r'\s+', ' ', processed_message).strip()
+        processed_message = self._re_ws.sub(' ', processed_message).strip()
         
         return processed_message
     
-    def _generate_with_llm(self, message: str, sentiment_analysis: Dict, context: Optional[Dict] = None) -> List[str]:
+    def _build_llm_request(self, message: str, sentiment_analysis: Dict) -> Dict[str, Any]:
         """
-        Génère des reformulations en utilisant un LLM (OpenAI).
+        Construit les paramètres de la requête de reformulation au LLM.
         
         Args:
             message (str): Le message à reformuler
             sentiment_analysis (Dict): Analyse du sentiment
-            context (Optional[Dict]): Contexte additionnel
             
         Returns:
-            List[str]: Liste des reformulations générées
+            Dict[str, Any]: Paramètres pour chat.completions.create
         """
-        try:
-            # Construction du prompt
-            system_prompt = """Tu es un assistant spécialisé dans la médiation parentale. 
-            Ton rôle est de reformuler les messages entre parents séparés pour les rendre neutres, 
-            apaisés et centrés sur l'intérêt de l'enfant. 
+        system_prompt = """Tu es un assistant spécialisé dans la médiation parentale. 
+        Ton rôle est de reformuler les messages entre parents séparés pour les rendre neutres, 
+        apaisés et centrés sur l'intérêt de l'enfant. 
 
-            Règles à respecter:
-            - Préserver le contenu informatif essentiel
-            - Éliminer l'agressivité, les reproches et les accusations
-            - Utiliser un ton neutre et respectueux
-            - Centrer sur l'intérêt de l'enfant quand c'est pertinent
-            - Phrases courtes et claires
-            - Une seule information principale par message
-            - Pas de points d'exclamation ni de questions rhétoriques"""
+        Règles à respecter:
+        - Préserver le contenu informatif essentiel
+        - Éliminer l'agressivité, les reproches et les accusations
+        - Utiliser un ton neutre et respectueux
+        - Centrer sur l'intérêt de l'enfant quand c'est pertinent
+        - Phrases courtes et claires
+        - Une seule information principale par message
+        - Pas de points d'exclamation ni de questions rhétoriques"""
+        
+        user_prompt = f"""Message à reformuler: "{message}"
+        
+        Sentiment détecté: {sentiment_analysis.get('sentiment', 'neutre')}
+        Émotions détectées: {', '.join(sentiment_analysis.get('emotion_detected', []))}
+        
+        Propose une reformulation, sans numérotation ni commentaire."""
+        
+        # n=2 : deux reformulations indépendantes en un seul aller-retour
+        return {
+            'model': "gpt-3.5-turbo",
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            'n': 2,
+            'max_tokens': 150,
+            'temperature': 0.7
+        }
+    
+    def _extract_choices(self, response) -> List[str]:
+        """
+        Extrait le texte de chaque complétion retournée par le LLM.
+        
+        Args:
+            response: Réponse de chat.completions.create
             
-            user_prompt = f"""Message à reformuler: "{message}"
+        Si le modèle numérote malgré tout sa réponse ("1. ...", "2. ..."),
+        chaque élément numéroté est retenu comme un texte distinct.
+        
+        Returns:
+            List[str]: Textes non vides des complétions
+        """
+        texts = []
+        for choice in response.choices:
+            content = (choice.message.content or '').strip()
+            if not content:
+                continue
+            numbered = [m.group(2).strip() for m in self._re_numbered.finditer(content)]
+            if numbered:
+                texts.extend(item for item in numbered if item)
+            else:
+                texts.append(content)
+        return texts
+    
+    def _llm_cache_key(self, kind: str, message: str, sentiment_analysis: Optional[Dict] = None) -> tuple:
+        """
+        Construit la clé de cache d'un appel au LLM.
+        
+        Args:
+            kind (str): Type d'appel ('rephrase' ou 'responses')
+            message (str): Le message envoyé au LLM
+            sentiment_analysis (Optional[Dict]): Analyse du sentiment utilisée dans le prompt
             
-            Sentiment détecté: {sentiment_analysis.get('sentiment', 'neutre')}
-            Émotions détectées: {', '.join(sentiment_analysis.get('emotion_detected', []))}
+        Returns:
+            tuple: Clé hashable (message normalisé, sentiment, émotions)
+        """
+        message_norm = self._re_ws.sub(' ', message).strip().lower()
+        if sentiment_analysis is None:
+            return (kind, message_norm)
+        return (
+            kind,
+            message_norm,
+            sentiment_analysis.get('sentiment', 'neutre'),
+            tuple(sentiment_analysis.get('emotion_detected', []))
+        )
+    
+    def _llm_cache_get(self, key: tuple) -> Optional[List[str]]:
+        """
+        Récupère une réponse du LLM en cache.
+        
+        Args:
+            key (tuple): Clé de cache
             
-            Propose 2 reformulations différentes, numérotées 1. et 2."""
+        Returns:
+            Optional[List[str]]: Textes en cache, ou None
+        """
+        with self._llm_cache_lock:
+            texts = self._llm_cache.get(key)
+            if texts is not None:
+                self._llm_cache.move_to_end(key)
+            return texts
+    
+    def _llm_cache_put(self, key: tuple, texts: List[str]) -> None:
+        """
+        Met en cache une réponse du LLM. Les réponses vides (erreurs) ne sont pas conservées.
+        
+        Args:
+            key (tuple): Clé de cache
+            texts (List[str]): Textes générés
+        """
+        if not texts:
+            return
+        with self._llm_cache_lock:
+            self._llm_cache[key] = texts
+            self._llm_cache.move_to_end(key)
+            while len(self._llm_cache) > self.llm_cache_size:
+                self._llm_cache.popitem(last=False)
+    
+    def _generate_with_llm(self, message: str, sentiment_analysis: Dict, context: Optional[Dict] = None) -> List[str]:
+        """
+        Génère des reformulations en utilisant un LLM (OpenAI).
+        
+        Args:
+            message (str): Le message à reformuler
+            sentiment_analysis (Dict): Analyse du sentiment
+            context (Optional[Dict]): Contexte additionnel
             
+        Returns:
+            List[str]: Liste des reformulations générées
+        """
+        cache_key = self._llm_cache_key('rephrase', message, sentiment_analysis)
+        cached = self._llm_cache_get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        try:
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=300,
-                temperature=0.7
+                **self._build_llm_request(message, sentiment_analysis)
             )
+            reformulations = self._extract_choices(response)[:2]  # Maximum 2 reformulations
+            self._llm_cache_put(cache_key, reformulations)
+            return list(reformulations)
             
-            content = response.choices[0].message.content
-            
-            # Extraction des reformulations numérotées
-            reformulations = []
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith('1.') or line.startswith('2.'):
-                    reformulation = line[2:].strip()
-                    if reformulation:
-                        reformulations.append(reformulation)
+        except Exception as e:
+            print(f"Erreur lors de la génération LLM: {e}")
+            return []
+    
+    async def _generate_with_llm_async(self, async_client: AsyncOpenAI, message: str, sentiment_analysis: Dict, context: Optional[Dict] = None) -> List[str]:
+        """
+        Version asynchrone de _generate_with_llm, utilisée par rephrase_batch.
+        
+        Args:
+            async_client (AsyncOpenAI): Client asynchrone du lot en cours
+            message (str): Le message à reformuler
+            sentiment_analysis (Dict): Analyse du sentiment
+            context (Optional[Dict]): Contexte additionnel
             
-            return reformulations[:2]  # Maximum 2 reformulations
+        Returns:
+            List[str]: Liste des reformulations générées
+        """
+        cache_key = self._llm_cache_key('rephrase', message, sentiment_analysis)
+        cached = self._llm_cache_get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        try:
+            response = await async_client.chat.completions.create(
+                **self._build_llm_request(message, sentiment_analysis)
+            )
+            reformulations = self._extract_choices(response)[:2]  # Maximum 2 reformulations
+            self._llm_cache_put(cache_key, reformulations)
+            return list(reformulations)
             
         except Exception as e:
             print(f"Erreur lors de la génération LLM: {e}")
@@ -229,10 +434,8 @@ class MessageRephraser:
             return False
         
         # Vérification qu'il n'y a pas de mots déclencheurs restants
-        text_lower = reformulated_text.lower()
-        for trigger in self.trigger_replacements.keys():
-            if trigger in text_lower:
-                return False
+        if self._trigger_re.search(reformulated_text):
+            return False
         
         # Vérification de la longueur (pas trop long)
         if len(reformulated_text) > 500:
@@ -276,49 +479,59 @@ class MessageRephraser:
         Returns:
             List[Dict[str, Any]]: Liste de réponses suggérées
         """
-        try:
-            system_prompt = """Tu es un assistant spécialisé dans la médiation parentale. 
-            Génère des réponses appropriées à des messages entre parents séparés.
-            
-            Les réponses doivent être:
-            - Centrées sur l'intérêt de l'enfant
-            - Neutres et respectueuses
-            - Informatives et constructives
-            - Courtes et claires"""
-            
-            user_prompt = f"""Message reçu: "{received_message}"
-            
-            Propose 3 réponses différentes, numérotées 1., 2., et 3."""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=400,
-                temperature=0.7
-            )
-            
-            content = response.choices[0].message.content
-            
-            # Extraction des réponses numérotées
-            responses = []
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line.startswith(('1.', '2.', '3.')):
-                    response_text = line[2:].strip()
-                    if response_text:
-                        responses.append({
-                            'text': response_text,
-                            'type': 'assisted_response',
-                            'focus': 'child_centered'
-                        })
-            
-            return responses[:3]
-            
-        except Exception as e:
-            print(f"Erreur lors de la génération de réponses assistées: {e}")
-            return []
+        cache_key = self._llm_cache_key('responses', received_message)
+        response_texts = self._llm_cache_get(cache_key)
+        
+        if response_texts is None:
+            try:
+                system_prompt = """Tu es un assistant spécialisé dans la médiation parentale. 
+                Génère des réponses appropriées à des messages entre parents séparés.
+                
+                Les réponses doivent être:
+                - Centrées sur l'intérêt de l'enfant
+                - Neutres et respectueuses
+                - Informatives et constructives
+                - Courtes et claires"""
+                
+                user_prompt = f"""Message reçu: "{received_message}"
+                
+                Propose une réponse, sans numérotation ni commentaire."""
+                
+                # n=3 : trois réponses indépendantes en un seul aller-retour
+                response = self.client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    n=3,
+                    max_tokens=150,
+                    temperature=0.7
+                )
+                
+                response_texts = self._extract_choices(response)[:3]
+                self._llm_cache_put(cache_key, response_texts)
+                
+            except Exception as e:
+                print(f"Erreur lors de la génération de réponses assistées: {e}")
+                return []
+        
+        return [
+            {
+                'text': response_text,
+                'type': 'assisted_response',
+                'focus': 'child_centered'
+            }
+            for response_text in response_texts
+        ]
 
+@lru_cache(maxsize=1)
+def get_message_rephraser() -> MessageRephraser:
+    """
+    Retourne l'instance partagée du module de reformulation.
+    L'instance est propre au processus (un exemplaire par worker Gunicorn).
+    
+    Returns:
+        MessageRephraser: Instance partagée
+    """
+    return MessageRephraser()
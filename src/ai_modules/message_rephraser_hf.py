@@ -5,7 +5,9 @@ Version gratuite pour le déploiement
 """
 
 import re
+import bisect
 import logging
+from functools import lru_cache
 from typing import Dict, List, Any, Optional
 
 # Configuration du logging
@@ -13,6 +15,23 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class MessageRephraser:
+    # Mots-clés d'intention (recherchés comme sous-chaînes du message en minuscules)
+    _RE_RECUPERATION = re.compile('récupérer|chercher|prendre')
+    _RE_RETARD = re.compile('retard|attendre')
+    _RE_PROBLEME = re.compile('problème|souci|difficulté')
+    _RE_SANTE = re.compile('médecin|docteur|santé|malade')
+    _RE_URGENCE = re.compile('urgent|important|problème')
+    _RE_ACCORD = re.compile('merci|accord|ok|bien')
+    _RE_POLITESSE = re.compile("merci|cordialement|s'il te plaît")
+    
+    # Niveaux d'impact du mode miroir : seuils de score (croissants) puis niveau et recommandation
+    _IMPACT_THRESHOLDS = [3, 6]
+    _IMPACT_LEVELS = [
+        ("Faible", "Ce message semble approprié pour la communication."),
+        ("Modéré", "Ce message pourrait être mal perçu. Considérez une reformulation."),
+        ("Élevé", "Ce message risque de créer des tensions. Une reformulation est fortement recommandée."),
+    ]
+    
     def __init__(self):
         """Initialise le module de reformulation avec des règles locales"""
         logger.info("Module de reformulation initialisé en mode gratuit (règles locales)")
@@ -43,6 +62,62 @@ class MessageRephraser:
             "afin de maintenir la stabilité pour l'enfant"
         ]
         
+        # Règles de transformation grammaticale
+        grammar_rules = [
+            # Remplacer les accusations directes
+            (r'\btu (ne |n\')?(.+?) (jamais|toujours)', r'il serait bien de \2'),
+            (r'\btu es (.+)', r'il semble que'),
+            (r'\bpourquoi tu (.+)', r'serait-il possible de \1'),
+            
+            # Supprimer les généralisations
+            (r'\btoujours\b', 'parfois'),
+            (r'\bjamais\b', 'rarement'),
+            
+            # Adoucir le ton
+            (r'\barrête de (.+)', r'il serait préférable de ne pas \1'),
+            (r'\btu dois (.+)', r'il serait bien de \1'),
+            
+            # Centrer sur l'enfant
+            (r'\bc\'est ta faute', 'pour le bien de notre enfant'),
+            (r'\bà cause de toi', 'dans l\'intérêt de notre enfant'),
+        ]
+        
+        # Détection de tous les déclencheurs en une seule passe ; le lookahead
+        # relève aussi les déclencheurs qui se chevauchent
+        triggers = sorted(self.trigger_replacements.keys(), key=len, reverse=True)
+        self._re_triggers = re.compile('(?=(' + '|'.join(re.escape(t) for t in triggers) + '))')
+        
+        # Enchaînements où un déclencheur en masque un autre (« pourquoi tu dois ») : remplacés
+        # comme par les substitutions successives, dans l'ordre de trigger_replacements
+        self._trigger_chains = {'pourquoi ' + t for t in self.trigger_replacements if t.startswith('tu ')}
+        self._sequential_rules = [
+            (re.compile(re.escape(trigger), re.IGNORECASE), replacement)
+            for trigger, replacement in self.trigger_replacements.items()
+        ]
+        
+        # Remplacement de tous les déclencheurs en une seule passe (le plus long d'abord)
+        substitutions = sorted(self._trigger_chains.union(triggers), key=len, reverse=True)
+        self._re_trigger_sub = re.compile('|'.join(re.escape(t) for t in substitutions), re.IGNORECASE)
+        
+        # Règles grammaticales précompilées une seule fois
+        self._compiled_rules = [
+            (re.compile(pattern, re.IGNORECASE), replacement)
+            for pattern, replacement in grammar_rules
+        ]
+        
+        # Union de toutes les règles grammaticales : une seule passe suffit à savoir
+        # si l'une d'elles peut s'appliquer (le cas le plus fréquent est qu'aucune ne s'applique)
+        self._re_grammar_any = re.compile(
+            '|'.join(f'(?:{pattern})' for pattern, _ in grammar_rules), re.IGNORECASE
+        )
+        
+        # Nettoyage de la ponctuation et des espaces
+        self._cleanup = [
+            (re.compile(r'!{2,}'), '.'),  # Remplacer !! par .
+            (re.compile(r'\?{2,}'), '?'),  # Limiter les ?
+            (re.compile(r'\s+'), ' ')  # Nettoyer les espaces
+        ]
+        
         # Réponses types
         self.template_responses = [
             "J'ai bien reçu ton message. Pour le bien de notre enfant, pourrions-nous discuter de cela calmement ?",
@@ -52,18 +127,16 @@ class MessageRephraser:
             "J'ai bien compris ton message. Pour le bien-être de notre enfant, restons constructifs."
         ]
     
-    def detect_triggers(self, text):
+    def detect_triggers(self, text, text_lower=None):
         """Détecte les mots et expressions déclencheurs dans le texte"""
-        triggers = []
-        text_lower = text.lower()
-        
-        for trigger in self.trigger_replacements.keys():
-            if trigger in text_lower:
-                triggers.append(trigger)
+        if text_lower is None:
+            text_lower = text.lower()
+        found = {match.group(1) for match in self._re_triggers.finditer(text_lower)}
+        triggers = [trigger for trigger in self.trigger_replacements if trigger in found]
         
         # Détection d'autres indicateurs de tension
         tension_indicators = ['!', 'MAJUSCULES', 'accusations directes']
-        if any(char in text for char in ['!', '?']):
+        if '!' in text or '?' in text:
             triggers.append('ponctuation excessive')
         
         if text.isupper():
@@ -71,44 +144,35 @@ class MessageRephraser:
         
         return triggers
     
+    def _replace_trigger(self, match):
+        """Remplacement d'un déclencheur trouvé par _re_trigger_sub"""
+        span = match.group(0)
+        if span.lower() not in self._trigger_chains:
+            return self.trigger_replacements.get(span.lower(), span)
+        
+        for pattern, replacement in self._sequential_rules:
+            span = pattern.sub(replacement, span)
+        return span
+    
     def apply_calming_rules(self, text):
         """Applique les règles d'apaisement au texte"""
         result = text
         
-        # Appliquer les remplacements de déclencheurs
-        for trigger, replacement in self.trigger_replacements.items():
-            result = re.sub(re.escape(trigger), replacement, result, flags=re.IGNORECASE)
+        # Remplacements de déclencheurs
+        result = self._re_trigger_sub.sub(self._replace_trigger, result)
         
-        # Règles de transformation grammaticale
-        grammar_rules = [
-            # Remplacer les accusations directes
-            (r'\btu (ne |n\')?(.+?) (jamais|toujours)', r'il serait bien de \2'),
-            (r'\btu es (.+)', r'il semble que'),
-            (r'\bpourquoi tu (.+)', r'serait-il possible de \1'),
-            
-            # Supprimer les généralisations
-            (r'\btoujours\b', 'parfois'),
-            (r'\bjamais\b', 'rarement'),
-            
-            # Adoucir le ton
-            (r'\barrête de (.+)', r'il serait préférable de ne pas \1'),
-            (r'\btu dois (.+)', r'il serait bien de \1'),
-            
-            # Centrer sur l'enfant
-            (r'\bc\'est ta faute', 'pour le bien de notre enfant'),
-            (r'\bà cause de toi', 'dans l\'intérêt de notre enfant'),
-        ]
-        
-        for pattern, replacement in grammar_rules:
-            result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
+        # Règles de transformation grammaticale, appliquées dans l'ordre si l'une d'elles correspond
+        if self._re_grammar_any.search(result):
+            for pattern, replacement in self._compiled_rules:
+                result = pattern.sub(replacement, result)
         
-        # Nettoyage de la ponctuation
-        result = re.sub(r'!{2,}', '.', result)  # Remplacer !! par .
-        result = re.sub(r'\?{2,}', '?', result)  # Limiter les ?
-        result = re.sub(r'\s+', ' ', result).strip()  # Nettoyer les espaces
+        # Nettoyage de la ponctuation et des espaces
+        for pattern, replacement in self._cleanup:
+            result = pattern.sub(replacement, result)
+        result = result.strip()
         
         # Ajouter une formule de politesse si nécessaire
-        if not any(word in result.lower() for word in ['merci', 'cordialement', 's\'il te plaît']):
+        if not self._RE_POLITESSE.search(result.lower()):
             if not result.endswith('.'):
                 result += '.'
             result += ' Merci.'
@@ -136,13 +200,14 @@ class MessageRephraser:
                 }
             
             # Détecter les déclencheurs
-            triggers = self.detect_triggers(original_message)
+            message_lower = original_message.lower()
+            triggers = self.detect_triggers(original_message, message_lower)
             
             # Appliquer les règles d'apaisement
             calmed_text = self.apply_calming_rules(original_message)
             
             # Créer une version alternative plus formelle
-            formal_version = self.create_formal_version(original_message)
+            formal_version = self.create_formal_version(original_message, message_lower)
             
             # Préparer les options de reformulation
             options = []
@@ -183,19 +248,22 @@ class MessageRephraser:
                 'recommendation': 'Erreur lors de la reformulation'
             }
     
-    def create_formal_version(self, message):
+    def create_formal_version(self, message, message_lower=None):
         """Crée une version plus formelle du message"""
+        if message_lower is None:
+            message_lower = message.lower()
+        
         # Extraire l'intention principale du message
-        if any(word in message.lower() for word in ['récupérer', 'chercher', 'prendre']):
+        if self._RE_RECUPERATION.search(message_lower):
             return "Je souhaiterais organiser la récupération de notre enfant selon les modalités convenues. Merci de me confirmer les détails."
         
-        if any(word in message.lower() for word in ['retard', 'en retard', 'attendre']):
+        if self._RE_RETARD.search(message_lower):
             return "Il y a eu un contretemps. Je vous tiendrai informé(e) de l'heure d'arrivée. Merci de votre compréhension."
         
-        if any(word in message.lower() for word in ['problème', 'souci', 'difficulté']):
+        if self._RE_PROBLEME.search(message_lower):
             return "Il semble y avoir une situation qui nécessite notre attention. Pourrions-nous en discuter dans l'intérêt de notre enfant ?"
         
-        if any(word in message.lower() for word in ['médecin', 'docteur', 'santé', 'malade']):
+        if self._RE_SANTE.search(message_lower):
             return "Je vous informe d'une question concernant la santé de notre enfant. Merci de me tenir au courant de votre côté également."
         
         # Version générique
@@ -223,15 +291,17 @@ class MessageRephraser:
         Returns:
             list: Liste de réponses suggérées
         """
+        message_lower = message.lower()
+        
         # Adapter selon le contexte du message
-        if any(word in message.lower() for word in ['urgent', 'important', 'problème']):
+        if self._RE_URGENCE.search(message_lower):
             return [
                 "J'ai bien reçu ton message urgent. Pour le bien de notre enfant, je vais traiter cela rapidement.",
                 "Merci de m'avoir alerté. Dans l'intérêt de notre enfant, nous devons résoudre cela ensemble.",
                 "J'ai pris note de l'urgence. Je reviens vers toi rapidement pour le bien-être de notre enfant."
             ]
         
-        if any(word in message.lower() for word in ['merci', 'accord', 'ok', 'bien']):
+        if self._RE_ACCORD.search(message_lower):
             return [
                 "Merci pour ton message. C'est parfait pour notre enfant.",
                 "J'ai bien reçu. Merci pour ta collaboration dans l'intérêt de notre enfant.",
@@ -279,22 +349,14 @@ class MessageRephraser:
         impact_score = len(triggers) * 2
         
         # Ajouter des points pour d'autres indicateurs
-        if any(char in message for char in ['!', '?']):
+        if '!' in message or '?' in message:
             impact_score += 1
         
         if message.isupper():
             impact_score += 3
         
         # Déterminer le niveau d'impact
-        if impact_score >= 6:
-            impact_level = "Élevé"
-            recommendation = "Ce message risque de créer des tensions. Une reformulation est fortement recommandée."
-        elif impact_score >= 3:
-            impact_level = "Modéré"
-            recommendation = "Ce message pourrait être mal perçu. Considérez une reformulation."
-        else:
-            impact_level = "Faible"
-            recommendation = "Ce message semble approprié pour la communication."
+        impact_level, recommendation = self._IMPACT_LEVELS[bisect.bisect_right(self._IMPACT_THRESHOLDS, impact_score)]
         
         return {
             'impact_score': impact_score,
@@ -309,3 +371,14 @@ class MessageRephraser:
             ] if impact_score > 2 else []
         }
 
+
+@lru_cache(maxsize=1)
+def get_message_rephraser() -> MessageRephraser:
+    """
+    Retourne l'instance partagée du module de reformulation.
+    L'instance est propre au processus (un exemplaire par worker Gunicorn).
+    
+    Returns:
+        MessageRephraser: Instance partagée
+    """
+    return MessageRephraser()
@@ -4,26 +4,90 @@ Analyse le ton et le sentiment des messages pour identifier les reproches,
 le sarcasme, l'agressivité passive, les accusations, et la manipulation émotionnelle.
 """
 
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
+import copy
+import os
 import re
-from typing import Dict, List, Any
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+# Modèle Hugging Face d'analyse de sentiment : DistilCamemBERT (6 couches, français uniquement),
+# distillé sur les mêmes 5 classes d'étoiles que nlptown/bert-base-multilingual-uncased-sentiment
+SENTIMENT_MODEL = os.getenv('LEO_SENTIMENT_MODEL', "cmarkea/distilcamembert-base-sentiment")
+
+# Correspondance explicite entre les labels des modèles et nos catégories
+SENTIMENT_LABELS = {
+    '1 star': 'hostile',
+    '2 stars': 'hostile',
+    '3 stars': 'neutre',
+    '4 stars': 'positif',
+    '5 stars': 'positif',
+    'negative': 'hostile',
+    'neutral': 'neutre',
+    'positive': 'positif',
+}
+
+# Quantification dynamique int8 optionnelle du modèle PyTorch (LEO_SENTIMENT_INT8=1), sans export ONNX
+SENTIMENT_INT8 = os.getenv('LEO_SENTIMENT_INT8', '0') == '1'
+
+# Compilation optionnelle du modèle PyTorch avec torch.compile (LEO_TORCH_COMPILE=1)
+SENTIMENT_TORCH_COMPILE = os.getenv('LEO_TORCH_COMPILE', '0') == '1'
+
+# Répertoire optionnel d'une version int8 (ONNX Runtime) du modèle, produite par
+# export_quantized_model ; nécessite les paquets optimum[onnxruntime]
+SENTIMENT_ONNX_DIR = os.getenv('LEO_SENTIMENT_ONNX_DIR', '')
+
+
+def export_quantized_model(save_dir: str) -> str:
+    """
+    Exporte le modèle de sentiment en ONNX puis le quantifie en int8
+    (quantification dynamique, instructions AVX-512 VNNI).
+    À lancer une fois au build ; le répertoire produit s'utilise via LEO_SENTIMENT_ONNX_DIR.
+    
+    Args:
+        save_dir (str): Répertoire de destination du modèle quantifié
+        
+    Returns:
+        str: Répertoire contenant le modèle quantifié
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    
+    model = ORTModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL, export=True)
+    model.save_pretrained(save_dir)
+    AutoTokenizer.from_pretrained(SENTIMENT_MODEL).save_pretrained(save_dir)
+    
+    quantizer = ORTQuantizer.from_pretrained(model)
+    quantizer.quantize(
+        save_dir=save_dir,
+        quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    )
+    return save_dir
+
 
 class SentimentAnalyzer:
-    def __init__(self):
+    # Message factice utilisé pour préchauffer le modèle après son chargement
+    _WARMUP_TEXT = "Bonjour, merci pour ton message."
+    
+    def __init__(self, cache_size: int = 4096):
         """
         Initialise le module de détection émotionnelle.
         Utilise un modèle pré-entraîné pour l'analyse des sentiments en français.
+        
+        Args:
+            cache_size (int): Nombre maximal d'analyses conservées en cache (LRU)
         """
-        try:
-            # Utilisation d'un modèle français pour l'analyse des sentiments
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model="nlptown/bert-base-multilingual-uncased-sentiment",
-                tokenizer="nlptown/bert-base-multilingual-uncased-sentiment"
-            )
-        except Exception as e:
-            print(f"Erreur lors du chargement du modèle de sentiment: {e}")
-            self.sentiment_pipeline = None
+        # Le modèle n'est chargé qu'à la première analyse (voir sentiment_pipeline)
+        self._pipeline = None
+        self._pipeline_loaded = False
+        self._pipeline_lock = threading.Lock()
+        
+        # Cache LRU des analyses, indexé par le texte sans espaces de bord (le modèle est déterministe)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
         
         # Mots et expressions déclencheurs pour la détection d'agressivité
         self.trigger_words = {
@@ -32,6 +96,147 @@ class SentimentAnalyzer:
             'accusations': ['tu fais exprès', 'tu mens', 'tu ne comprends rien', 'c\'est ta faute'],
             'manipulation': ['si tu m\'aimais', 'tu ne penses qu\'à toi', 'les enfants vont souffrir']
         }
+        
+        # Tous les mots déclencheurs, toutes catégories confondues, cherchés en une seule passe
+        all_words = sorted({word for words in self.trigger_words.values() for word in words}, key=len, reverse=True)
+        self._re_trigger_words = re.compile('(?=(' + '|'.join(re.escape(w) for w in all_words) + '))')
+        
+        # Mots de généralisation et comparaisons négatives pour _detect_patterns
+        self._generalization_words = ('tous', 'toutes', 'personne', 'rien', 'jamais', 'toujours')
+        self._negative_comparisons = ('contrairement à', 'au moins lui', 'elle au moins')
+    
+    @property
+    def sentiment_pipeline(self):
+        """
+        Pipeline Hugging Face d'analyse de sentiment, chargé au premier accès.
+        Le chargement peut être désactivé avec LEO_ENABLE_HF=0.
+        
+        Returns:
+            Le pipeline, ou None s'il est désactivé ou indisponible
+        """
+        if not self._pipeline_loaded:
+            with self._pipeline_lock:
+                if not self._pipeline_loaded:
+                    self._pipeline = self._load_pipeline()
+                    self._pipeline_loaded = True
+        return self._pipeline
+    
+    def _load_pipeline(self):
+        """
+        Charge le pipeline Hugging Face d'analyse de sentiment.
+        
+        Returns:
+            Le pipeline, ou None s'il est désactivé ou indisponible
+        """
+        if os.getenv('LEO_ENABLE_HF', '1') != '1':
+            return None
+        
+        try:
+            from transformers import pipeline
+            
+            sentiment_pipeline = None
+            
+            # Version int8 (ONNX Runtime) si elle a été exportée, sinon modèle FP32 standard
+            if SENTIMENT_ONNX_DIR:
+                try:
+                    from optimum.onnxruntime import ORTModelForSequenceClassification
+                    
+                    sentiment_pipeline = pipeline(
+                        "sentiment-analysis",
+                        model=ORTModelForSequenceClassification.from_pretrained(
+                            SENTIMENT_ONNX_DIR, file_name="model_quantized.onnx"
+                        ),
+                        tokenizer=self._load_tokenizer(SENTIMENT_ONNX_DIR)
+                    )
+                except Exception as e:
+                    print(f"Modèle de sentiment int8 indisponible, utilisation du modèle standard: {e}")
+            
+            if sentiment_pipeline is None:
+                # Utilisation d'un modèle français pour l'analyse des sentiments
+                sentiment_pipeline = pipeline(
+                    "sentiment-analysis",
+                    model=SENTIMENT_MODEL,
+                    tokenizer=self._load_tokenizer(SENTIMENT_MODEL)
+                )
+                if SENTIMENT_INT8:
+                    self._quantize_model(sentiment_pipeline)
+                if SENTIMENT_TORCH_COMPILE:
+                    self._compile_model(sentiment_pipeline)
+            
+            # Préchauffage : les chargements paresseux du tokenizer et du modèle ont lieu
+            # ici, pas pendant l'analyse du premier message
+            sentiment_pipeline(self._WARMUP_TEXT)
+            return sentiment_pipeline
+        except Exception as e:
+            print(f"Erreur lors du chargement du modèle de sentiment: {e}")
+            return None
+    
+    def _load_tokenizer(self, name: str):
+        """
+        Charge le tokenizer rapide (Rust, bibliothèque tokenizers) du modèle. Si le modèle
+        n'en fournit pas, le tokenizer Python est converti en tokenizer rapide.
+        
+        Args:
+            name (str): Nom ou répertoire du modèle
+            
+        Returns:
+            Le tokenizer, rapide si la conversion est possible
+        """
+        from transformers import AutoTokenizer, PreTrainedTokenizerFast
+        
+        tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+        if tokenizer.is_fast:
+            return tokenizer
+        
+        try:
+            from transformers.convert_slow_tokenizer import convert_slow_tokenizer
+            
+            return PreTrainedTokenizerFast(
+                tokenizer_object=convert_slow_tokenizer(tokenizer),
+                **tokenizer.special_tokens_map
+            )
+        except Exception as e:
+            print(f"Tokenizer rapide indisponible pour {name}: {e}")
+            return tokenizer
+    
+    def _quantize_model(self, sentiment_pipeline) -> None:
+        """
+        Quantifie dynamiquement en int8 les couches linéaires du modèle du pipeline
+        (poids int8, produits scalaires int8 via fbgemm/VNNI sur CPU). Garde le modèle FP32 en cas d'échec.
+        
+        Args:
+            sentiment_pipeline: Pipeline Hugging Face dont le modèle est quantifié
+        """
+        try:
+            import torch
+            
+            sentiment_pipeline.model = torch.quantization.quantize_dynamic(
+                sentiment_pipeline.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        except Exception as e:
+            print(f"Erreur lors de la quantification du modèle de sentiment: {e}")
+    
+    def _compile_model(self, sentiment_pipeline) -> None:
+        """
+        Compile le modèle du pipeline avec torch.compile, puis le préchauffe pour que
+        la première requête ne paie pas la compilation. Garde le modèle d'origine en cas d'échec.
+        
+        Args:
+            sentiment_pipeline: Pipeline Hugging Face dont le modèle est compilé
+        """
+        model = sentiment_pipeline.model
+        try:
+            import torch
+            
+            if not hasattr(torch, 'compile'):
+                print("torch.compile indisponible (PyTorch < 2.0), modèle non compilé")
+                return
+            
+            sentiment_pipeline.model = torch.compile(model, mode="reduce-overhead", dynamic=True)
+            sentiment_pipeline(self._WARMUP_TEXT)
+        except Exception as e:
+            print(f"Erreur lors de la compilation du modèle de sentiment: {e}")
+            sentiment_pipeline.model = model
     
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """
@@ -43,15 +248,67 @@ class SentimentAnalyzer:
         Returns:
             Dict[str, Any]: Résultat de l'analyse avec sentiment, score et détails
         """
-        if not text or not text.strip():
-            return {
-                'sentiment': 'neutre',
-                'score': 0.5,
-                'emotion_detected': [],
-                'trigger_words_found': [],
-                'recommendation': 'Message vide'
-            }
+        return self.analyze_sentiments([text])[0]
+    
+    def analyze_sentiments(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyse le sentiment et le ton de plusieurs messages.
+        Les messages non vides sont soumis au modèle en un seul appel par lots.
+        
+        Args:
+            texts (List[str]): Les textes à analyser
+            
+        Returns:
+            List[Dict[str, Any]]: Résultats d'analyse, dans l'ordre des textes
+        """
+        # Les espaces de début et de fin n'influent ni sur le modèle ni sur les règles :
+        # les retirer permet de partager l'entrée en cache entre variantes d'un même message
+        texts = [text.strip() if text else text for text in texts]
         
+        cached = {}
+        with self._cache_lock:
+            for text in texts:
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    cached[text] = self._cache[text]
+        
+        # Seuls les textes non vides absents du cache sont soumis au modèle (une fois chacun)
+        to_classify = list(dict.fromkeys(
+            text for text in texts if text and text not in cached
+        ))
+        model_outputs = dict(zip(to_classify, self._classify(to_classify)))
+        
+        results = []
+        for text in texts:
+            if not text:
+                results.append({
+                    'sentiment': 'neutre',
+                    'score': 0.5,
+                    'emotion_detected': [],
+                    'trigger_words_found': [],
+                    'recommendation': 'Message vide'
+                })
+                continue
+            
+            if text not in cached:
+                cached[text] = self._analyze_text(text, model_outputs[text])
+            
+            # Copie pour que l'appelant ne puisse pas modifier l'entrée en cache
+            results.append(copy.deepcopy(cached[text]))
+        
+        return results
+    
+    def _analyze_text(self, text: str, model_output: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Construit l'analyse d'un texte non vide et la met en cache.
+        
+        Args:
+            text (str): Le texte à analyser
+            model_output (Optional[Dict[str, Any]]): Label et score du modèle, None s'il est indisponible
+        
+        Returns:
+            Dict[str, Any]: Résultat de l'analyse
+        """
         result = {
             'sentiment': 'neutre',
             'score': 0.5,
@@ -60,30 +317,16 @@ class SentimentAnalyzer:
             'recommendation': ''
         }
         
-        # Analyse avec le modèle de sentiment si disponible
-        if self.sentiment_pipeline:
-            try:
-                sentiment_result = self.sentiment_pipeline(text)
-                if sentiment_result:
-                    label = sentiment_result[0]['label'].lower()
-                    score = sentiment_result[0]['score']
-                    
-                    # Mapping des labels vers nos catégories
-                    if 'negative' in label or '1' in label or '2' in label:
-                        result['sentiment'] = 'hostile'
-                    elif 'positive' in label or '4' in label or '5' in label:
-                        result['sentiment'] = 'positif'
-                    else:
-                        result['sentiment'] = 'neutre'
-                    
-                    result['score'] = score
-            except Exception as e:
-                print(f"Erreur lors de l'analyse de sentiment: {e}")
+        # Résultat du modèle de sentiment si disponible
+        if model_output:
+            result['sentiment'] = self._map_label(model_output['label'])
+            result['score'] = model_output['score']
         
         # Détection des mots déclencheurs
         text_lower = text.lower()
+        present = {match.group(1) for match in self._re_trigger_words.finditer(text_lower)}
         for category, words in self.trigger_words.items():
-            found_words = [word for word in words if word in text_lower]
+            found_words = [word for word in words if word in present]
             if found_words:
                 result['emotion_detected'].append(category)
                 result['trigger_words_found'].extend(found_words)
@@ -95,8 +338,48 @@ class SentimentAnalyzer:
         # Génération de recommandations
         result['recommendation'] = self._generate_recommendation(result)
         
+        # Une analyse sans modèle n'est conservée que si le modèle est désactivé,
+        # pas après un échec ponctuel de l'inférence
+        if model_output or self.sentiment_pipeline is None:
+            with self._cache_lock:
+                self._cache[text] = result
+                self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
         return result
     
+    def _classify(self, texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Soumet un lot de textes au modèle de sentiment.
+        
+        Args:
+            texts (List[str]): Textes non vides à classer
+            
+        Returns:
+            List[Optional[Dict[str, Any]]]: Label et score par texte, None si le modèle est indisponible
+        """
+        if not texts or not self.sentiment_pipeline:
+            return [None] * len(texts)
+        
+        try:
+            return self.sentiment_pipeline(texts, batch_size=16, truncation=True)
+        except Exception as e:
+            print(f"Erreur lors de l'analyse de sentiment: {e}")
+            return [None] * len(texts)
+    
+    def _map_label(self, label: str) -> str:
+        """
+        Convertit un label du modèle vers nos catégories.
+        
+        Args:
+            label (str): Label retourné par le modèle
+            
+        Returns:
+            str: 'hostile', 'positif' ou 'neutre'
+        """
+        return SENTIMENT_LABELS.get(label.lower(), 'neutre')
+    
     def _detect_patterns(self, text: str) -> List[str]:
         """
         Détecte des patterns spécifiques dans le texte.
@@ -110,8 +393,8 @@ class SentimentAnalyzer:
         patterns_detected = []
         text_lower = text.lower()
         
-        # Détection de questions rhétoriques agressives
-        if re.search(r'\?.*\?', text) or text_lower.count('?') > 2:
+        # Détection de questions rhétoriques agressives (au moins deux points d'interrogation)
+        if text.count('?') >= 2:
             patterns_detected.append('questions_rhetoriques')
         
         # Détection d'exclamations excessives
@@ -119,12 +402,11 @@ class SentimentAnalyzer:
             patterns_detected.append('exclamations_excessives')
         
         # Détection de généralisation
-        generalization_words = ['tous', 'toutes', 'personne', 'rien', 'jamais', 'toujours']
-        if any(word in text_lower for word in generalization_words):
+        if any(word in text_lower for word in self._generalization_words):
             patterns_detected.append('generalisation')
         
         # Détection de comparaisons négatives
-        if any(phrase in text_lower for phrase in ['contrairement à', 'au moins lui', 'elle au moins']):
+        if any(phrase in text_lower for phrase in self._negative_comparisons):
             patterns_detected.append('comparaison_negative')
         
         return patterns_detected
@@ -182,3 +464,14 @@ class SentimentAnalyzer:
             'analysis': analysis
         }
 
+
+@lru_cache(maxsize=1)
+def get_sentiment_analyzer() -> SentimentAnalyzer:
+    """
+    Retourne l'instance partagée du module de détection émotionnelle.
+    L'instance est propre au processus (un exemplaire par worker Gunicorn).
+    
+    Returns:
+        SentimentAnalyzer: Instance partagée
+    """
+    return SentimentAnalyzer()
@@ -1,3 +1,2 @@
-from flask_sqlalchemy import SQLAlchemy
-
-db = SQLAlchemy()
+# Instance unique de SQLAlchemy, définie dans src.models (évite une seconde instance jamais initialisée)
+from src.models import db
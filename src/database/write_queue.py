@@ -0,0 +1,142 @@
+"""
+File d'écriture en arrière-plan pour l'application Léo.
+Les enregistrements dont la réponse n'a pas besoin (historique des messages) sont
+placés dans une file et validés en base par lots par un thread dédié, hors du chemin
+de la requête. Un arrêt brutal du processus peut perdre les écritures de la dernière
+fenêtre (BATCH_WINDOW_MS) ; un arrêt normal les termine.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from src.models import db
+
+# Taille maximale d'un lot et durée d'attente des écritures suivantes
+MAX_BATCH = 100
+BATCH_WINDOW_MS = 50
+# Attente maximale (s) des écritures en attente à l'arrêt du processus
+SHUTDOWN_TIMEOUT = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter:
+    def __init__(self, app=None, max_batch: int = MAX_BATCH, window_ms: int = BATCH_WINDOW_MS):
+        """
+        Initialise la file d'écriture. Les écritures arrivées dans une même fenêtre
+        sont validées ensemble, en une seule transaction.
+
+        Args:
+            app (Optional[Flask]): Application dont le contexte est utilisé pour écrire en base
+            max_batch (int): Nombre maximal d'objets par transaction
+            window_ms (int): Attente maximale (ms) des écritures suivantes après la première
+        """
+        self.app = None
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue = queue.Queue()
+
+        # Le thread d'écriture n'est démarré qu'au premier ajout (après le fork des workers)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Associe la file à l'application Flask.
+
+        Args:
+            app (Flask): Application Flask
+        """
+        self.app = app
+        app.extensions['background_writer'] = self
+
+    def add(self, obj):
+        """
+        Place un objet à enregistrer dans la file ; il sera validé en base par le thread d'écriture.
+
+        Args:
+            obj (db.Model): Objet à enregistrer
+        """
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='background-writer', daemon=True)
+                    self._worker.start()
+                    # Les écritures en attente sont terminées avant l'arrêt du processus (délai borné)
+                    atexit.register(self._drain)
+
+        self._queue.put(obj)
+
+    def _run(self):
+        """Boucle du thread d'écriture : constitue les lots puis les valide en une transaction"""
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queue.get(timeout=self.window))
+            except queue.Empty:
+                pass
+
+            try:
+                with self.app.app_context():
+                    self._commit(batch)
+            except Exception:
+                # Un lot en échec ne doit pas arrêter le thread d'écriture
+                logger.exception("Lot de %d écritures en arrière-plan perdu", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _drain(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """
+        Attend que les écritures en attente soient validées, au plus timeout secondes.
+
+        Args:
+            timeout (float): Attente maximale, en secondes
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.error(
+                        "%d écritures en arrière-plan abandonnées à l'arrêt", self._queue.unfinished_tasks
+                    )
+                    return
+                self._queue.all_tasks_done.wait(remaining)
+
+    def _commit(self, batch):
+        """
+        Valide un lot en une transaction ; en cas d'échec, les objets sont repris un par un
+        pour qu'une ligne invalide ne fasse pas perdre tout le lot.
+
+        Args:
+            batch (List[db.Model]): Objets à enregistrer
+        """
+        try:
+            db.session.add_all(batch)
+            db.session.commit()
+            return
+        except Exception:
+            db.session.rollback()
+            if len(batch) == 1:
+                logger.exception("Écriture en arrière-plan perdue: %r", batch[0])
+                return
+            logger.exception("Échec du lot de %d écritures, reprise une par une", len(batch))
+
+        for obj in batch:
+            try:
+                db.session.add(obj)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Écriture en arrière-plan perdue: %r", obj)
+
+
+background_writer = BackgroundWriter()
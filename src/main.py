@@ -1,36 +1,109 @@
 import os
+import sqlite3
 import sys
 
+import orjson
+
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask
+from flask import Flask, abort, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import HTTPException
 
 from src.models.user import db
+from src.database.write_queue import background_writer
 from src.routes.user import user_bp
 from src.routes.auth_routes import auth_bp
 from src.routes.ai_routes import ai_bp
 
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Sérialisation JSON des réponses et lecture des corps de requête avec orjson (repli sur Flask pour les types non gérés)"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///leo.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'connect_args': {'check_same_thread': False, 'timeout': 30},
+    'pool_pre_ping': True
+}
 app.config['JWT_SECRET_KEY'] = 'ton-secret-super-secure'
 
+# Taille maximale d'un corps de requête JSON (les fichiers téléversés ne sont pas concernés)
+app.config['LEO_MAX_JSON_SIZE'] = 1 << 20
+
+# Compression des réponses JSON (brotli puis gzip), sauf pour les réponses courtes
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_BR_LEVEL'] = 4
+app.config['COMPRESS_MIN_SIZE'] = 500
+
 CORS(app)
+Compress(app)
 JWTManager(app)
 db.init_app(app)
+background_writer.init_app(app)
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Journal WAL (lectures non bloquées par les écritures) et lectures par mmap pour SQLite"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
 
 # Enregistrement des routes
 app.register_blueprint(user_bp, url_prefix="/api/users")
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(ai_bp, url_prefix="/api/ai")
 
+@app.before_request
+def limit_json_size():
+    """Refuse les corps JSON trop volumineux avant de les lire"""
+    if request.is_json and (request.content_length or 0) > app.config['LEO_MAX_JSON_SIZE']:
+        abort(413)
+
+@app.errorhandler(Exception)
+def handle_exception(e):
+    """Réponse JSON commune à toutes les erreurs des routes (remplace les try/except par route)"""
+    if isinstance(e, HTTPException):
+        return jsonify({'error': e.description}), e.code
+    
+    app.logger.exception(e)
+    db.session.rollback()
+    return jsonify({'error': str(e)}), 500
+
 @app.route("/")
 def index():
     return {"message": "Bienvenue sur le backend de Léo 👋"}
 
-# Création automatique de la base au démarrage (Render + Gunicorn)
-with app.app_context():
-    db.create_all()
\ No newline at end of file
+@app.cli.command("init-db")
+def init_db():
+    """Crée les tables de la base (à lancer une fois au déploiement : flask --app src.main init-db)"""
+    db.create_all()
+    print("Base de données initialisée")
+
+# Création de la base à l'import seulement si demandé (LEO_INIT_DB=1), pour ne pas
+# ralentir ni sérialiser le démarrage de chaque worker Gunicorn sur le fichier SQLite
+if os.getenv('LEO_INIT_DB') == '1':
+    with app.app_context():
+        db.create_all()
\ No newline at end of file
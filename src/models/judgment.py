@@ -1,23 +1,51 @@
+import operator
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.user import db
 
 class Judgment(db.Model):
+    __table_args__ = (
+        # Pagination par clé des jugements d'un utilisateur
+        db.Index('ix_judgment_user_id', 'user_id', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     document_path = db.Column(db.String(255), nullable=False)
     extracted_data_json = db.Column(db.JSON, nullable=True)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Champs sérialisés par to_dict, lus en un seul appel
+    _DICT_FIELDS = (
+        'id', 'user_id', 'document_path', 'extracted_data_json', 'upload_date'
+    )
+    _dict_values = operator.attrgetter(*_DICT_FIELDS)
+    
     def __repr__(self):
         return f'<Judgment {self.id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'document_path': self.document_path,
-            'extracted_data_json': self.extracted_data_json,
-            'upload_date': self.upload_date.isoformat() if self.upload_date else None
-        }
-
+        data = dict(zip(self._DICT_FIELDS, self._dict_values(self)))
+        if data['upload_date']:
+            data['upload_date'] = data['upload_date'].isoformat()
+        return data
+    
+    @classmethod
+    def list_for_user(cls, user_id, include_data=False, limit=50, after_id=None):
+        """
+        Jugements d'un utilisateur lus par projection SQL, sans objets ORM ; les données extraites seulement sur demande.
+        Pagination par clé : les plus récents d'abord, au plus `limit` jugements d'id inférieur à `after_id`.
+        """
+        fields = cls._DICT_FIELDS if include_data else tuple(f for f in cls._DICT_FIELDS if f != 'extracted_data_json')
+        query = db.select(*[getattr(cls, field) for field in fields]).where(cls.user_id == user_id)
+        if after_id is not None:
+            query = query.where(cls.id < after_id)
+        rows = db.session.execute(query.order_by(cls.id.desc()).limit(limit))
+        
+        judgments = []
+        for row in rows:
+            data = dict(zip(fields, row))
+            if data['upload_date']:
+                data['upload_date'] = data['upload_date'].isoformat()
+            judgments.append(data)
+        return judgments
@@ -1,8 +1,17 @@
+import operator
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.user import db
 
 class Message(db.Model):
+    __table_args__ = (
+        # Historique d'un utilisateur (envoyés / reçus), trié par date
+        db.Index('ix_msg_sender_created', 'sender_id', 'created_at'),
+        db.Index('ix_msg_receiver_created', 'receiver_id', 'created_at'),
+        # Pagination par clé de l'historique conservé
+        db.Index('ix_msg_sender_consent_id', 'sender_id', 'consent_to_store', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -12,18 +21,40 @@ class Message(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     consent_to_store = db.Column(db.Boolean, default=False)
     
+    # Champs sérialisés par to_dict, lus en un seul appel
+    _DICT_FIELDS = (
+        'id', 'sender_id', 'receiver_id', 'original_content', 'rephrased_content',
+        'sentiment_analysis_result', 'created_at', 'consent_to_store'
+    )
+    _dict_values = operator.attrgetter(*_DICT_FIELDS)
+    
     def __repr__(self):
         return f'<Message {self.id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'sender_id': self.sender_id,
-            'receiver_id': self.receiver_id,
-            'original_content': self.original_content,
-            'rephrased_content': self.rephrased_content,
-            'sentiment_analysis_result': self.sentiment_analysis_result,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'consent_to_store': self.consent_to_store
-        }
-
+        data = dict(zip(self._DICT_FIELDS, self._dict_values(self)))
+        if data['created_at']:
+            data['created_at'] = data['created_at'].isoformat()
+        return data
+    
+    @classmethod
+    def list_history(cls, user_id, limit=50, after_id=None):
+        """
+        Messages conservés (avec consentement) d'un utilisateur, lus par projection SQL sans objets ORM.
+        Pagination par clé : les plus récents d'abord, au plus `limit` messages d'id inférieur à `after_id`.
+        """
+        query = (
+            db.select(*[getattr(cls, field) for field in cls._DICT_FIELDS])
+            .where(cls.sender_id == user_id, cls.consent_to_store == True)
+        )
+        if after_id is not None:
+            query = query.where(cls.id < after_id)
+        rows = db.session.execute(query.order_by(cls.id.desc()).limit(limit))
+        return [cls._row_to_dict(row) for row in rows]
+    
+    @classmethod
+    def _row_to_dict(cls, row):
+        data = dict(zip(cls._DICT_FIELDS, row))
+        if data['created_at']:
+            data['created_at'] = data['created_at'].isoformat()
+        return data
@@ -1,7 +1,29 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from functools import lru_cache
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError
+from werkzeug.security import check_password_hash
 from src.models import db  # On importe db depuis __init__.py
 
+# Hachage argon2 (implémentation C qui libère le GIL pendant le calcul)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    """Hachage factice, calculé une seule fois par processus"""
+    return password_hasher.hash('leo-dummy-password')
+
+
+def verify_dummy_password(password):
+    """Vérification factice au même coût qu'une vraie, quand aucun utilisateur ne correspond"""
+    try:
+        password_hasher.verify(_dummy_password_hash(), password)
+    except VerificationError:
+        pass
+    return False
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -13,10 +35,23 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Vérifie le mot de passe ; un ancien hachage (werkzeug ou paramètres argon2 obsolètes) est remplacé à la volée"""
+        if not self.password_hash.startswith('$argon2'):
+            valid = check_password_hash(self.password_hash, password)
+            needs_rehash = valid
+        else:
+            try:
+                valid = password_hasher.verify(self.password_hash, password)
+            except (VerificationError, InvalidHash):
+                valid = False
+            needs_rehash = valid and password_hasher.check_needs_rehash(self.password_hash)
+
+        if needs_rehash:
+            self.set_password(password)
+        return valid
 
     def to_dict(self):
         return {
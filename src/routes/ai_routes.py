@@ -2,43 +2,97 @@
 Routes API pour les modules IA de l'application Léo.
 """
 
+from concurrent.futures import TimeoutError as AnalysisTimeout
+
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.ai_modules.sentiment_analyzer import SentimentAnalyzer
-from src.ai_modules.message_rephraser_hf import MessageRephraser
-from src.ai_modules.legal_processor import LegalProcessor
+from werkzeug.utils import secure_filename
+from src.ai_modules.sentiment_analyzer import get_sentiment_analyzer
+from src.ai_modules.batcher import get_sentiment_batcher
+from src.ai_modules.message_rephraser_hf import get_message_rephraser
+from src.ai_modules.legal_processor import get_legal_processor
 from src.models.message import Message, db
 from src.models.judgment import Judgment
-import os
+from src.database.write_queue import background_writer
 
 ai_bp = Blueprint('ai', __name__)
 
-# Initialisation des modules IA
-sentiment_analyzer = SentimentAnalyzer()
-message_rephraser = MessageRephraser()
-legal_processor = LegalProcessor()
+# Pagination des listes : taille par défaut et taille maximale d'une page
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Nombre maximal de messages analysés en une requête
+MAX_SENTIMENT_MESSAGES = 100
+
+# Les modules IA sont créés au premier appel de leur accesseur (get_*, instances partagées
+# au sein du processus) : un worker qui ne sert aucune route IA ne les charge jamais
+
+def _pagination_args():
+    """
+    Lit les paramètres de pagination par clé (?limit=...&after_id=...).
+    
+    Returns:
+        tuple: (limit borné à MAX_PAGE_SIZE, after_id ou None)
+    
+    Raises:
+        ValueError: Si un paramètre n'est pas un entier
+    """
+    limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    after_id = request.args.get('after_id')
+    return limit, int(after_id) if after_id is not None else None
+
+def _page(items, limit):
+    """
+    Curseur de la page suivante : id du dernier élément si la page est pleine.
+    
+    Args:
+        items (list): Éléments de la page, du plus récent au plus ancien
+        limit (int): Taille de page demandée
+    
+    Returns:
+        Optional[int]: Valeur de after_id pour la page suivante, ou None
+    """
+    return items[-1]['id'] if len(items) == limit else None
 
 @ai_bp.route('/analyze-sentiment', methods=['POST'])
 @jwt_required()
 def analyze_sentiment():
     """
-    Analyse le sentiment d'un message.
+    Analyse le sentiment d'un message, ou d'une liste de messages ('messages')
+    traitée en un seul lot par le modèle.
     """
-    try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Message requis'}), 400
+    data = request.get_json()
+    if data and 'messages' in data:
+        messages = data['messages']
+        if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+            return jsonify({'error': 'Liste de messages (chaînes de caractères) requise'}), 400
+        if len(messages) > MAX_SENTIMENT_MESSAGES:
+            return jsonify({'error': f'{MAX_SENTIMENT_MESSAGES} messages au maximum par requête'}), 400
         
-        message = data['message']
-        analysis = sentiment_analyzer.analyze_sentiment(message)
+        analyses = get_sentiment_analyzer().analyze_sentiments(messages)
         
         return jsonify({
             'success': True,
-            'analysis': analysis
+            'analyses': analyses
         })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message requis'}), 400
+    
+    message = data['message']
+    if not isinstance(message, str):
+        return jsonify({'error': 'Le message doit être une chaîne de caractères'}), 400
+    
+    # Regroupé avec les requêtes concurrentes en un seul passage du modèle
+    try:
+        analysis = get_sentiment_batcher().analyze(message)
+    except AnalysisTimeout:
+        return jsonify({'error': "Service d'analyse momentanément indisponible"}), 503
+    
+    return jsonify({
+        'success': True,
+        'analysis': analysis
+    })
 
 @ai_bp.route('/rephrase-message', methods=['POST'])
 @jwt_required()
@@ -46,36 +100,32 @@ def rephrase_message():
     """
     Reformule un message pour le rendre plus neutre et apaisant.
     """
-    try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Message requis'}), 400
-        
-        message = data['message']
-        context = data.get('context', None)
-        
-        result = message_rephraser.rephrase_message(message, context)
-        
-        # Optionnel: sauvegarder en base si l'utilisateur consent
-        user_id = get_jwt_identity()
-        if data.get('save_to_history', False):
-            new_message = Message(
-                sender_id=user_id,
-                original_content=message,
-                rephrased_content=result['rephrased_options'][0]['text'] if result['rephrased_options'] else None,
-                sentiment_analysis_result=result['analysis'],
-                consent_to_store=True
-            )
-            db.session.add(new_message)
-            db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'result': result
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message requis'}), 400
+    
+    message = data['message']
+    context = data.get('context', None)
+    
+    result = get_message_rephraser().rephrase_message(message, context)
+    
+    # Optionnel: sauvegarder en base si l'utilisateur consent
+    user_id = get_jwt_identity()
+    if data.get('save_to_history', False):
+        new_message = Message(
+            sender_id=user_id,
+            original_content=message,
+            rephrased_content=result['rephrased_options'][0]['text'] if result['rephrased_options'] else None,
+            sentiment_analysis_result=result['analysis'],
+            consent_to_store=True
+        )
+        # Enregistré en arrière-plan : la réponse n'attend pas l'écriture en base
+        background_writer.add(new_message)
+    
+    return jsonify({
+        'success': True,
+        'result': result
+    })
 
 @ai_bp.route('/generate-responses', methods=['POST'])
 @jwt_required()
@@ -83,23 +133,19 @@ def generate_responses():
     """
     Génère des réponses assistées à un message reçu.
     """
-    try:
-        data = request.get_json()
-        if not data or 'received_message' not in data:
-            return jsonify({'error': 'Message reçu requis'}), 400
-        
-        received_message = data['received_message']
-        context = data.get('context', None)
-        
-        responses = message_rephraser.generate_assisted_responses(received_message, context)
-        
-        return jsonify({
-            'success': True,
-            'responses': responses
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    if not data or 'received_message' not in data:
+        return jsonify({'error': 'Message reçu requis'}), 400
+    
+    received_message = data['received_message']
+    context = data.get('context', None)
+    
+    responses = get_message_rephraser().generate_assisted_responses(received_message, context)
+    
+    return jsonify({
+        'success': True,
+        'responses': responses
+    })
 
 @ai_bp.route('/mirror-mode', methods=['POST'])
 @jwt_required()
@@ -107,21 +153,17 @@ def mirror_mode():
     """
     Mode miroir: simule l'impact émotionnel d'un message avant envoi.
     """
-    try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Message requis'}), 400
-        
-        message = data['message']
-        feedback = sentiment_analyzer.get_mirror_feedback(message)
-        
-        return jsonify({
-            'success': True,
-            'feedback': feedback
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message requis'}), 400
+    
+    message = data['message']
+    feedback = get_sentiment_analyzer().get_mirror_feedback(message)
+    
+    return jsonify({
+        'success': True,
+        'feedback': feedback
+    })
 
 @ai_bp.route('/process-legal-document', methods=['POST'])
 @jwt_required()
@@ -129,31 +171,27 @@ def process_legal_document():
     """
     Traite un document juridique pour extraire les informations clés.
     """
-    try:
-        data = request.get_json()
-        if not data or 'document_text' not in data:
-            return jsonify({'error': 'Texte du document requis'}), 400
-        
-        document_text = data['document_text']
-        result = legal_processor.process_document(document_text)
-        
-        # Sauvegarder le résultat en base
-        user_id = get_jwt_identity()
-        if result['success']:
-            new_judgment = Judgment(
-                user_id=user_id,
-                document_path=data.get('document_path', 'uploaded_document'),
-                extracted_data_json=result['extracted_data']
-            )
-            db.session.add(new_judgment)
-            db.session.commit()
-            
-            result['judgment_id'] = new_judgment.id
-        
-        return jsonify(result)
+    data = request.get_json()
+    if not data or 'document_text' not in data:
+        return jsonify({'error': 'Texte du document requis'}), 400
+    
+    document_text = data['document_text']
+    result = get_legal_processor().process_document(document_text)
+    
+    # Sauvegarder le résultat en base
+    user_id = get_jwt_identity()
+    if result['success']:
+        new_judgment = Judgment(
+            user_id=user_id,
+            document_path=data.get('document_path', 'uploaded_document'),
+            extracted_data_json=result['extracted_data']
+        )
+        db.session.add(new_judgment)
+        db.session.commit()
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        result['judgment_id'] = new_judgment.id
+    
+    return jsonify(result)
 
 @ai_bp.route('/upload-legal-document', methods=['POST'])
 @jwt_required()
@@ -161,82 +199,116 @@ def upload_legal_document():
     """
     Upload et traite un fichier de document juridique.
     """
-    try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'Aucun fichier fourni'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'Nom de fichier vide'}), 400
-        
-        # Sauvegarde temporaire du fichier
-        upload_folder = '/tmp/leo_uploads'
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, file.filename)
-        file.save(file_path)
-        
-        # Simulation OCR (dans un vrai environnement, utiliser AWS Textract ou Tesseract)
-        document_text = legal_processor.simulate_ocr(file_path)
-        
-        # Traitement du document
-        result = legal_processor.process_document(document_text)
+    if 'file' not in request.files:
+        return jsonify({'error': 'Aucun fichier fourni'}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Nom de fichier vide'}), 400
+    
+    # OCR et traitement directement sur le flux téléversé, sans fichier temporaire
+    # (mis en cache par empreinte du contenu : un document identique n'est pas retraité)
+    result = get_legal_processor().process_upload(file.stream)
+    
+    # Sauvegarder le résultat en base
+    user_id = get_jwt_identity()
+    if result['success']:
+        new_judgment = Judgment(
+            user_id=user_id,
+            document_path=secure_filename(file.filename),
+            extracted_data_json=result['extracted_data']
+        )
+        db.session.add(new_judgment)
+        db.session.commit()
         
-        # Sauvegarder le résultat en base
-        user_id = get_jwt_identity()
+        result['judgment_id'] = new_judgment.id
+    
+    return jsonify(result)
+
+@ai_bp.route('/upload-legal-documents', methods=['POST'])
+@jwt_required()
+def upload_legal_documents():
+    """
+    Upload et traite plusieurs fichiers de documents juridiques en une seule requête.
+    Les jugements extraits sont enregistrés en une seule transaction.
+    """
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'Aucun fichier fourni'}), 400
+    
+    # OCR et traitement de chaque flux téléversé (mis en cache par empreinte du contenu)
+    legal_processor = get_legal_processor()
+    results = [legal_processor.process_upload(file.stream) for file in files]
+    
+    # Sauvegarder les résultats en base
+    user_id = get_jwt_identity()
+    new_judgments = []
+    for file, result in zip(files, results):
+        result['filename'] = secure_filename(file.filename)
         if result['success']:
-            new_judgment = Judgment(
+            new_judgments.append((result, Judgment(
                 user_id=user_id,
-                document_path=file_path,
+                document_path=result['filename'],
                 extracted_data_json=result['extracted_data']
-            )
-            db.session.add(new_judgment)
-            db.session.commit()
-            
-            result['judgment_id'] = new_judgment.id
-        
-        # Nettoyage du fichier temporaire
-        os.remove(file_path)
-        
-        return jsonify(result)
+            )))
+    
+    if new_judgments:
+        db.session.add_all([judgment for _, judgment in new_judgments])
+        db.session.commit()
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        for result, judgment in new_judgments:
+            result['judgment_id'] = judgment.id
+    
+    return jsonify({
+        'success': True,
+        'results': results
+    })
 
 @ai_bp.route('/get-judgments', methods=['GET'])
 @jwt_required()
 def get_judgments():
     """
-    Récupère les jugements traités pour l'utilisateur connecté.
+    Récupère les jugements traités pour l'utilisateur connecté, par pages
+    (?limit=...&after_id=...), les plus récents d'abord.
+    Les données extraites ne sont incluses qu'avec ?include=data.
     """
+    user_id = get_jwt_identity()
+    include_data = request.args.get('include') == 'data'
     try:
-        user_id = get_jwt_identity()
-        judgments = Judgment.query.filter_by(user_id=user_id).all()
-        
-        return jsonify({
-            'success': True,
-            'judgments': [judgment.to_dict() for judgment in judgments]
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        limit, after_id = _pagination_args()
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
+    
+    judgments = Judgment.list_for_user(user_id, include_data=include_data, limit=limit, after_id=after_id)
+    
+    return jsonify({
+        'success': True,
+        'judgments': judgments,
+        'next_after_id': _page(judgments, limit)
+    })
 
 @ai_bp.route('/get-message-history', methods=['GET'])
 @jwt_required()
 def get_message_history():
     """
-    Récupère l'historique des messages pour l'utilisateur connecté.
+    Récupère l'historique des messages pour l'utilisateur connecté, par pages
+    (?limit=...&after_id=...), les plus récents d'abord.
     """
+    user_id = get_jwt_identity()
     try:
-        user_id = get_jwt_identity()
-        messages = Message.query.filter_by(sender_id=user_id, consent_to_store=True).all()
-        
-        return jsonify({
-            'success': True,
-            'messages': [message.to_dict() for message in messages]
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        limit, after_id = _pagination_args()
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
+    
+    # Page bornée à MAX_PAGE_SIZE : lue entièrement avant l'envoi, pour que les erreurs
+    # passent par le gestionnaire commun au lieu de tronquer une réponse 200
+    messages = Message.list_history(user_id, limit=limit, after_id=after_id)
+    
+    return jsonify({
+        'success': True,
+        'messages': messages,
+        'next_after_id': _page(messages, limit)
+    })
 
 @ai_bp.route('/delete-message-history', methods=['DELETE'])
 @jwt_required()
@@ -244,16 +316,12 @@ def delete_message_history():
     """
     Supprime l'historique des messages (droit à l'oubli).
     """
-    try:
-        user_id = get_jwt_identity()
-        Message.query.filter_by(sender_id=user_id).delete()
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Historique supprimé avec succès'
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    Message.query.filter_by(sender_id=user_id).delete(synchronize_session=False)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Historique supprimé avec succès'
+    })
 
@@ -2,107 +2,140 @@
 Routes d'authentification pour l'application Léo.
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
-from src.models.user import User, db
+from sqlalchemy.exc import IntegrityError
+from src.models.user import User, db, verify_dummy_password
 from datetime import timedelta
 
 auth_bp = Blueprint('auth', __name__)
 
+def _current_user():
+    """
+    Utilisateur correspondant au jeton JWT, chargé au plus une fois par requête.
+    
+    Returns:
+        Optional[User]: Utilisateur connecté, ou None s'il n'existe plus
+    """
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, get_jwt_identity())
+    return g.current_user
+
+# Contraintes d'unicité de la table user (message SQLite, nom de contrainte PostgreSQL)
+_UNIQUE_VIOLATIONS = (
+    (('unique constraint failed: user.email', 'user_email_key'), 'Email déjà utilisé'),
+    (('unique constraint failed: user.username', 'user_username_key'), 'Nom d\'utilisateur déjà utilisé'),
+)
+
+def _duplicate_user_error(error):
+    """
+    Message d'erreur correspondant à la contrainte d'unicité violée.
+    
+    Args:
+        error (IntegrityError): Erreur levée par la base
+    
+    Returns:
+        Optional[str]: Message à renvoyer au client, ou None si l'erreur n'est pas
+        une violation d'unicité de l'email ou du nom d'utilisateur
+    """
+    detail = str(error.orig).lower()
+    for markers, message in _UNIQUE_VIOLATIONS:
+        if any(marker in detail for marker in markers):
+            return message
+    return None
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """
     Inscription d'un nouvel utilisateur.
     """
+    data = request.get_json()
+    
+    # Validation des données
+    required_fields = ['username', 'email', 'password']
+    for field in required_fields:
+        if not data.get(field):
+            return jsonify({'error': f'{field} requis'}), 400
+    
+    username = data['username']
+    email = data['email']
+    password = data['password']
+    role = data.get('role', 'user')  # 'user' ou 'pro'
+    
+    # Validation du mot de passe (minimum 8 caractères)
+    if len(password) < 8:
+        return jsonify({'error': 'Le mot de passe doit contenir au moins 8 caractères'}), 400
+    
+    # Création du nouvel utilisateur
+    new_user = User(
+        username=username,
+        email=email,
+        role=role
+    )
+    new_user.set_password(password)
+    
+    # Un seul INSERT : l'unicité de l'email et du nom d'utilisateur est garantie par la base
+    db.session.add(new_user)
     try:
-        data = request.get_json()
-        
-        # Validation des données
-        required_fields = ['username', 'email', 'password']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} requis'}), 400
-        
-        username = data['username']
-        email = data['email']
-        password = data['password']
-        role = data.get('role', 'user')  # 'user' ou 'pro'
-        
-        # Vérification que l'utilisateur n'existe pas déjà
-        if User.query.filter_by(email=email).first():
-            return jsonify({'error': 'Email déjà utilisé'}), 400
-        
-        if User.query.filter_by(username=username).first():
-            return jsonify({'error': 'Nom d\'utilisateur déjà utilisé'}), 400
-        
-        # Validation du mot de passe (minimum 8 caractères)
-        if len(password) < 8:
-            return jsonify({'error': 'Le mot de passe doit contenir au moins 8 caractères'}), 400
-        
-        # Création du nouvel utilisateur
-        hashed_password = generate_password_hash(password)
-        new_user = User(
-            username=username,
-            email=email,
-            password_hash=hashed_password,
-            role=role
-        )
-        
-        db.session.add(new_user)
         db.session.commit()
-        
-        # Génération du token JWT
-        access_token = create_access_token(
-            identity=new_user.id,
-            expires_delta=timedelta(days=7)
-        )
-        
-        return jsonify({
-            'success': True,
-            'message': 'Utilisateur créé avec succès',
-            'access_token': access_token,
-            'user': new_user.to_dict()
-        }), 201
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    except IntegrityError as e:
+        db.session.rollback()
+        message = _duplicate_user_error(e)
+        if message is None:
+            raise
+        return jsonify({'error': message}), 400
+    
+    # Génération du token JWT
+    access_token = create_access_token(
+        identity=new_user.id,
+        expires_delta=timedelta(days=7)
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': 'Utilisateur créé avec succès',
+        'access_token': access_token,
+        'user': new_user.to_dict()
+    }), 201
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """
     Connexion d'un utilisateur.
     """
-    try:
-        data = request.get_json()
-        
-        if not data.get('email') or not data.get('password'):
-            return jsonify({'error': 'Email et mot de passe requis'}), 400
-        
-        email = data['email']
-        password = data['password']
-        
-        # Recherche de l'utilisateur
-        user = User.query.filter_by(email=email).first()
-        
-        if not user or not check_password_hash(user.password_hash, password):
-            return jsonify({'error': 'Email ou mot de passe incorrect'}), 401
-        
-        # Génération du token JWT
-        access_token = create_access_token(
-            identity=user.id,
-            expires_delta=timedelta(days=7)
-        )
-        
-        return jsonify({
-            'success': True,
-            'message': 'Connexion réussie',
-            'access_token': access_token,
-            'user': user.to_dict()
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    
+    if not data.get('email') or not data.get('password'):
+        return jsonify({'error': 'Email et mot de passe requis'}), 400
+    
+    email = data['email']
+    password = data['password']
+    
+    # Recherche de l'utilisateur
+    user = User.query.filter_by(email=email).first()
+    
+    # Le mot de passe est toujours vérifié, même sans utilisateur, pour que la durée
+    # de la réponse ne révèle pas si l'email existe
+    valid = user.check_password(password) if user else verify_dummy_password(password)
+    if not valid:
+        return jsonify({'error': 'Email ou mot de passe incorrect'}), 401
+    
+    # Enregistrement du hachage mis à jour par check_password le cas échéant
+    if db.session.is_modified(user):
+        db.session.commit()
+    
+    # Génération du token JWT
+    access_token = create_access_token(
+        identity=user.id,
+        expires_delta=timedelta(days=7)
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': 'Connexion réussie',
+        'access_token': access_token,
+        'user': user.to_dict()
+    })
 
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
@@ -110,20 +143,15 @@ def get_profile():
     """
     Récupère le profil de l'utilisateur connecté.
     """
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'Utilisateur non trouvé'}), 404
-        
-        return jsonify({
-            'success': True,
-            'user': user.to_dict()
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user = _current_user()
+    
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+    
+    return jsonify({
+        'success': True,
+        'user': user.to_dict()
+    })
 
 @auth_bp.route('/profile', methods=['PUT'])
 @jwt_required()
@@ -131,43 +159,38 @@ def update_profile():
     """
     Met à jour le profil de l'utilisateur connecté.
     """
+    user = _current_user()
+    
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+    
+    data = request.get_json()
+    
+    # Mise à jour des champs autorisés (seulement s'ils changent)
+    if 'username' in data and data['username'] != user.username:
+        user.username = data['username']
+    
+    if 'email' in data and data['email'] != user.email:
+        user.email = data['email']
+    
+    if 'preferences' in data:
+        user.preferences = data['preferences']
+    
+    # L'unicité du nom d'utilisateur et de l'email est garantie par la base
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'Utilisateur non trouvé'}), 404
-        
-        data = request.get_json()
-        
-        # Mise à jour des champs autorisés
-        if 'username' in data:
-            # Vérifier que le nouveau nom d'utilisateur n'est pas déjà pris
-            existing_user = User.query.filter_by(username=data['username']).first()
-            if existing_user and existing_user.id != user.id:
-                return jsonify({'error': 'Nom d\'utilisateur déjà utilisé'}), 400
-            user.username = data['username']
-        
-        if 'email' in data:
-            # Vérifier que le nouvel email n'est pas déjà pris
-            existing_user = User.query.filter_by(email=data['email']).first()
-            if existing_user and existing_user.id != user.id:
-                return jsonify({'error': 'Email déjà utilisé'}), 400
-            user.email = data['email']
-        
-        if 'preferences' in data:
-            user.preferences = data['preferences']
-        
         db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Profil mis à jour avec succès',
-            'user': user.to_dict()
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    except IntegrityError as e:
+        db.session.rollback()
+        message = _duplicate_user_error(e)
+        if message is None:
+            raise
+        return jsonify({'error': message}), 400
+    
+    return jsonify({
+        'success': True,
+        'message': 'Profil mis à jour avec succès',
+        'user': user.to_dict()
+    })
 
 @auth_bp.route('/change-password', methods=['POST'])
 @jwt_required()
@@ -175,40 +198,35 @@ def change_password():
     """
     Change le mot de passe de l'utilisateur connecté.
     """
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'Utilisateur non trouvé'}), 404
-        
-        data = request.get_json()
-        
-        if not data.get('current_password') or not data.get('new_password'):
-            return jsonify({'error': 'Mot de passe actuel et nouveau mot de passe requis'}), 400
-        
-        current_password = data['current_password']
-        new_password = data['new_password']
-        
-        # Vérification du mot de passe actuel
-        if not check_password_hash(user.password_hash, current_password):
-            return jsonify({'error': 'Mot de passe actuel incorrect'}), 401
-        
-        # Validation du nouveau mot de passe
-        if len(new_password) < 8:
-            return jsonify({'error': 'Le nouveau mot de passe doit contenir au moins 8 caractères'}), 400
-        
-        # Mise à jour du mot de passe
-        user.password_hash = generate_password_hash(new_password)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Mot de passe changé avec succès'
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user = _current_user()
+    
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+    
+    data = request.get_json()
+    
+    if not data.get('current_password') or not data.get('new_password'):
+        return jsonify({'error': 'Mot de passe actuel et nouveau mot de passe requis'}), 400
+    
+    current_password = data['current_password']
+    new_password = data['new_password']
+    
+    # Vérification du mot de passe actuel
+    if not user.check_password(current_password):
+        return jsonify({'error': 'Mot de passe actuel incorrect'}), 401
+    
+    # Validation du nouveau mot de passe
+    if len(new_password) < 8:
+        return jsonify({'error': 'Le nouveau mot de passe doit contenir au moins 8 caractères'}), 400
+    
+    # Mise à jour du mot de passe
+    user.set_password(new_password)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Mot de passe changé avec succès'
+    })
 
 @auth_bp.route('/delete-account', methods=['DELETE'])
 @jwt_required()
@@ -216,29 +234,25 @@ def delete_account():
     """
     Supprime le compte de l'utilisateur connecté (droit à l'oubli).
     """
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'Utilisateur non trouvé'}), 404
-        
-        # Suppression de toutes les données associées
-        from src.models.message import Message
-        from src.models.judgment import Judgment
-        
-        Message.query.filter_by(sender_id=user_id).delete()
-        Judgment.query.filter_by(user_id=user_id).delete()
-        
-        # Suppression de l'utilisateur
-        db.session.delete(user)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Compte supprimé avec succès'
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user = _current_user()
+    
+    if not user:
+        return jsonify({'error': 'Utilisateur non trouvé'}), 404
+    
+    # Suppression de toutes les données associées : DELETE en masse sans charger les lignes,
+    # validées avec l'utilisateur dans une seule transaction
+    from src.models.message import Message
+    from src.models.judgment import Judgment
+    
+    Message.query.filter_by(sender_id=user.id).delete(synchronize_session=False)
+    Judgment.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    
+    # Suppression de l'utilisateur
+    db.session.delete(user)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Compte supprimé avec succès'
+    })
 
@@ -0,0 +1,28 @@
+"""
+Tests des règles locales du module de reformulation intelligente.
+"""
+
+import unittest
+
+try:
+    from src.ai_modules.message_rephraser import MessageRephraser
+except ImportError:  # openai / httpx absents de l'environnement
+    MessageRephraser = None
+
+
+@unittest.skipIf(MessageRephraser is None, "dépendances du module de reformulation absentes")
+class ApplyTypedRulesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rephraser = MessageRephraser()
+
+    def test_replaces_triggers_case_insensitively(self):
+        self.assertEqual(self.rephraser._apply_typed_rules("Tu es JAMAIS là"), "Tu es rarement là")
+
+    def test_casefold_variant_does_not_crash(self):
+        # 'ſ' (s long) correspond à 's' en IGNORECASE, mais 'jamaiſ'.lower() n'est pas une clé
+        self.assertEqual(self.rephraser._apply_typed_rules("jamaiſ"), "jamaiſ")
+
+
+if __name__ == '__main__':
+    unittest.main()